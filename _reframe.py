@@ -0,0 +1,3632 @@
+import ast
+import collections
+import concurrent.futures
+import contextlib
+import copy
+import csv
+import functools
+import hashlib
+import io
+import json
+import operator
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+import weakref
+import numpy as np
+import pandas as pd
+
+__all__ = ['Relation','GroupWrap','LazyRelation','LazyGroupWrap','PreparedQuery','set_csv_cache','set_parallel','set_result_cache','set_memory_limit','Profile','profile']
+
+# the number of rows cartesian_product builds at a time when it filters the product as it goes
+PRODUCT_CHUNKSIZE = 1000000
+# the number of rows Relation.scan reads from a file at a time
+SCAN_CHUNKSIZE = 100000
+# the directory of the binary cache for csv files, None when the cache is off
+_csv_cache_dir = None
+# string columns loaded from a file are stored as categoricals when the number of distinct values is
+# at most this fraction of the number of rows, for example 0.5, 0 keeps every column as strings.
+# Categoricals save memory, but expressions such as country.continent + '!' do not work on them.
+CATEGORY_RATIO = 0
+# njoin and the groupby aggregates only split relations with at least this many rows between workers
+PARALLEL_MIN_ROWS = 1000000
+# the number of workers set by set_parallel, and the pool they run in once it has been started
+_workers = 1
+_pool_kind = 'thread'
+_pool = None
+# the cache of operator results, None when it is off, see set_result_cache
+_result_cache = None
+# the bytes njoin and the groupby aggregates may use before they spill to disk, and the directory
+# they spill to, see set_memory_limit
+_memory_limit = None
+_spill_dir = None
+# the Profile the operators are recorded in, None when profiling is off, see profile
+_profiler = None
+
+
+def set_csv_cache(directory):
+    """Keep a binary copy of every csv file loaded by Relation(filepath) in directory
+
+    Parsing a large text file is slow, so once the cache is on the first ``Relation(filepath)`` saves
+    the parsed data in a binary columnar file and later ones load that instead.  The cached copy is
+    rebuilt when the csv file changes.  Feather files are used when pyarrow is installed, and are
+    memory mapped when they are read, otherwise the data is pickled.
+
+    :param directory: the directory to keep the cache in, or None to turn the cache off
+    """
+    global _csv_cache_dir
+    if directory is not None:
+        os.makedirs(directory, exist_ok=True)
+    _csv_cache_dir = directory
+
+
+def set_parallel(workers, pool='thread'):
+    """Split hash joins and groupby aggregates on large relations between several workers
+
+    The rows of both sides of a join are hash partitioned on the join attributes and every worker
+    joins one pair of partitions.  When there are few groups, a groupby aggregate is computed on a
+    slice of the rows by every worker and the partial results are combined.  When there are many
+    groups, or for a median or the sum or mean of floats, which cannot be combined that way without
+    changing the result, the rows are hash partitioned on the group by attributes instead.  Results
+    are the same as with one worker.
+
+    :param workers: the number of workers, 1 runs everything in the calling thread
+    :param pool: ``'thread'`` to run the workers as threads, which share the data, or ``'process'``
+        to run them as processes, which copy the data they work on but never wait for each other
+    """
+    global _workers, _pool_kind, _pool
+    if pool not in ('thread', 'process'):
+        raise ValueError("pool must be 'thread' or 'process'")
+    if _pool is not None:
+        _pool.shutdown()
+    _workers, _pool_kind, _pool = max(int(workers), 1), pool, None
+
+
+def set_result_cache(max_entries=128, max_bytes=None):
+    """Remember the results of operators so that repeating them on unchanged relations is free
+
+    An operator called with the same arguments on relations with the same contents as an earlier
+    call returns the earlier result instead of computing it again.  Relations are compared by a
+    fingerprint of their contents, which is computed once and remembered until the relation is
+    changed, so a relation loaded again from an unchanged file hits the cache as well.  The least
+    recently used results are dropped when either limit is reached.  Every call returns its own copy
+    of the result, so changes to it, for example by ``extend``, stay out of the cache.  With pandas
+    copy on write, which is always on from pandas 3, the copy shares the data of the cached result
+    until it is changed; with older versions the data is copied and relations are hashed again every
+    time they are used.
+
+    :param max_entries: the most results to keep, 0 turns the cache off
+    :param max_bytes: the most memory the results may use, None for no limit
+
+    :Example:
+
+    >>> from reframe import Relation, set_result_cache
+    >>> set_result_cache()
+    >>> country = Relation('country.csv')
+    >>> europe = country.query('continent == "Europe"')
+    >>> europe.extend('name', europe['name'].str.upper()).project(['name']).head(2)
+              name
+    1  NETHERLANDS
+    3      ALBANIA
+    >>> country.query('continent == "Europe"').project(['name']).head(2)
+              name
+    1  Netherlands
+    3      Albania
+    >>> set_result_cache(0)
+    """
+    global _result_cache
+    _result_cache = _ResultCache(max_entries, max_bytes) if max_entries else None
+
+
+def set_memory_limit(limit, directory=None):
+    """Make njoin and the groupby aggregates work in pieces when they would need more memory than limit
+
+    A hash join whose result and row positions are estimated to need more than limit is done as a
+    grace hash join: the rows of both relations are hash partitioned on the join attributes, the
+    partitions are joined one at a time, splitting the left rows of a partition further when a
+    skewed key has too many matches, and the joined rows are written to temporary files and merged
+    into the result a column at a time.  A groupby aggregate over more rows than fit the limit
+    aggregates one hash partition of the groups at a time the same way.  Results are the same as
+    without a limit, the result itself still has to fit in memory.
+
+    :param limit: a number of bytes, or a string such as ``'4GB'`` or ``'500MB'``, None for no limit
+    :param directory: the directory for the temporary files, None for the system default
+    """
+    global _memory_limit, _spill_dir
+    _memory_limit = None if limit is None else _parse_size(limit)
+    _spill_dir = directory
+
+
+# the smallest piece of work, in bytes, a join or aggregate is split into when it spills
+_SPILL_MIN_BYTES = 2 ** 20
+
+_SIZE_UNITS = {'B': 1, 'KB': 2 ** 10, 'MB': 2 ** 20, 'GB': 2 ** 30, 'TB': 2 ** 40}
+
+def _parse_size(size):
+    """return the number of bytes in a size such as 4096 or '4GB'"""
+    if isinstance(size, str):
+        match = re.fullmatch(r'\s*(\d+(?:\.\d*)?)\s*([KMGT]?B)\s*', size.upper())
+        if match is None:
+            raise ValueError("'{}' is not a size, for example '4GB'".format(size))
+        return int(float(match.group(1)) * _SIZE_UNITS[match.group(2)])
+    return int(size)
+
+
+def _parallel(size):
+    """return True when work on size rows should be split between the workers"""
+    return _workers > 1 and size >= PARALLEL_MIN_ROWS
+
+
+def _map(func, tasks):
+    """return [func(*task) for task in tasks], computed by the workers"""
+    global _pool
+    if _workers == 1:
+        return [func(*task) for task in tasks]
+    if _pool is None:
+        executor = concurrent.futures.ThreadPoolExecutor if _pool_kind == 'thread' else concurrent.futures.ProcessPoolExecutor
+        _pool = executor(_workers)
+    return [future.result() for future in [_pool.submit(func, *task) for task in tasks]]
+
+
+def _hash_partition(values, parts):
+    """split the positions of values into parts lists, equal values always go to the same one, parts < 2**16
+
+    :param values: an integer array, for example join codes or row hashes
+    :return: a list of sorted position arrays
+    """
+    # mix the bits so that keys with a pattern, say all even, still spread evenly
+    mixed = (np.asarray(values).astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(32)
+    # a stable sort of 16 bit integers is a radix sort, linear in the number of rows
+    part = (mixed % np.uint64(parts)).astype(np.uint16)
+    order = np.argsort(part, kind='stable')
+    return np.split(order, np.cumsum(np.bincount(part, minlength=parts))[:-1])
+
+
+def _load_csv(filepath, sep):
+    """read a csv file, through the binary cache when it is on"""
+    if _csv_cache_dir is None:
+        return _categorize(pd.read_csv(filepath, sep=sep))
+    try:
+        import pyarrow.feather as feather
+    except ImportError:
+        feather = None
+    # the name identifies the file, separator and encoding, the suffix the version of the file that was cached
+    stat = os.stat(filepath)
+    name = hashlib.sha1('{}\0{}\0{}'.format(os.path.abspath(filepath), sep, CATEGORY_RATIO).encode()).hexdigest()
+    version = '{}-{}'.format(stat.st_mtime_ns, stat.st_size)
+    cached = os.path.join(_csv_cache_dir, '{}-{}.{}'.format(name, version, 'feather' if feather else 'pkl'))
+    if os.path.exists(cached):
+        try:
+            if feather:
+                return feather.read_table(cached, memory_map=True).to_pandas()
+            return pd.read_pickle(cached)
+        except Exception:
+            # a damaged cache file is replaced by parsing the csv file again
+            pass
+
+    frame = _categorize(pd.read_csv(filepath, sep=sep))
+    for old in os.listdir(_csv_cache_dir):
+        if old.startswith(name + '-'):
+            # another process may be removing it as well
+            with contextlib.suppress(OSError):
+                os.remove(os.path.join(_csv_cache_dir, old))
+    # every process writes its own temporary file, so one that is being written is never replaced
+    fd, temp = tempfile.mkstemp(dir=_csv_cache_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            if feather:
+                feather.write_feather(frame, f)
+            else:
+                frame.to_pickle(f)
+        os.replace(temp, cached)
+    except Exception:
+        # data that cannot be stored in the cache is simply read from the csv file every time
+        with contextlib.suppress(OSError):
+            os.remove(temp)
+    return frame
+
+
+def _categorize(frame):
+    """dictionary encode the string columns of frame that have few distinct values
+
+    Categoricals use much less memory than strings, and joins and groupby hash the small integer
+    codes instead of the strings.
+    """
+    if not CATEGORY_RATIO:
+        return frame
+    dtypes = {}
+    for col in frame.columns:
+        if pd.api.types.is_object_dtype(frame[col]) or pd.api.types.is_string_dtype(frame[col]):
+            if frame[col].nunique() <= CATEGORY_RATIO * len(frame):
+                dtypes[col] = 'category'
+    return frame.astype(dtypes) if dtypes else frame
+
+
+def _align_categories(left, right, cols):
+    """return left and right with the same categories in every categorical column of cols
+
+    pandas falls back to plain strings when it combines categoricals with different categories, so
+    both sides get the union of the two sets of categories first.
+    """
+    dtypes = {}
+    for col in cols:
+        ltype, rtype = left[col].dtype, right[col].dtype
+        if ltype != rtype and (isinstance(ltype, pd.CategoricalDtype) or isinstance(rtype, pd.CategoricalDtype)):
+            dtypes[col] = pd.CategoricalDtype(_categories(left[col]).union(_categories(right[col])))
+    if not dtypes:
+        return left, right
+    return left.astype(dtypes), right.astype(dtypes)
+
+
+def _categories(series):
+    """return the categories of a categorical series, or the distinct values of any other"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.categories
+    return pd.Index(series.dropna().unique())
+
+
+def _row_codes(left, right, cols):
+    """return dense codes for the rows of left followed by the rows of right, and how many codes there are
+
+    Rows with equal values in cols, missing values included, get equal codes.  Every row is hashed
+    to 64 bits once, from a word per value, and the hashes are numbered.  Rows sharing a hash are compared with the first row
+    that had it, and should two different rows ever collide the rows are numbered by their values
+    instead.  The two sides are concatenated before hashing, which gives columns of different types
+    on the two sides, say int and float, one type to be hashed and compared in.
+    """
+    if len(right):
+        both = pd.concat([pd.DataFrame(left[cols]), pd.DataFrame(right[cols])], ignore_index=True)
+    else:
+        both = pd.DataFrame(left[cols]).reset_index(drop=True)
+    codes, uniques = pd.factorize(_row_hashes(both))
+    first = _first_rows(codes, len(uniques))
+    later = np.flatnonzero(~first)
+    if len(later):
+        earlier = np.flatnonzero(first)[codes[later]]
+        for col in cols:
+            if not _same_values(both[col], later, earlier):
+                codes, uniques = pd.factorize(np.concatenate(_join_codes(left, right, cols)))
+                break
+    return codes, len(uniques)
+
+def _row_hashes(frame):
+    """return a uint64 hash of every row of frame, equal rows get equal hashes"""
+    hashes = np.zeros(len(frame), dtype=np.uint64)
+    for col in frame.columns:
+        hashes ^= _words(frame[col])
+        hashes *= np.uint64(0x9E3779B97F4A7C15)
+        hashes ^= hashes >> np.uint64(29)
+    return hashes
+
+def _words(series):
+    """return a uint64 for every value of series, equal values get equal words and missing values one word"""
+    dtype = series.dtype
+    if isinstance(dtype, np.dtype) and dtype.kind in 'biu':
+        return series.to_numpy().astype(np.uint64)
+    if isinstance(dtype, np.dtype) and dtype.kind == 'f':
+        # adding 0.0 turns -0.0 into 0.0, and every NaN gets the same bits
+        values = series.to_numpy(dtype=np.float64) + 0.0
+        values[np.isnan(values)] = np.nan
+        return values.view(np.uint64)
+    if isinstance(dtype, np.dtype) and dtype.kind in 'mM':
+        return series.to_numpy().view(np.int64).astype(np.uint64)
+    return pd.factorize(series)[0].astype(np.uint64)
+
+def _same_values(series, positions, others):
+    """return True if series has the same value, or both a missing value, at positions and others"""
+    if isinstance(series.dtype, np.dtype) and series.dtype.kind in 'biufmM':
+        values = series.to_numpy()
+        a, b = values[positions], values[others]
+        if series.dtype.kind in 'biu':
+            return bool((a == b).all())
+        return bool(((a == b) | (pd.isna(a) & pd.isna(b))).all())
+    a = series.take(positions).reset_index(drop=True)
+    b = series.take(others).reset_index(drop=True)
+    return bool(((a == b).fillna(False) | (a.isna() & b.isna())).all())
+
+def _first_rows(codes, ncodes):
+    """return a boolean array that is True for the first row with each code"""
+    first = np.empty(ncodes, dtype=np.intp)
+    # assigning in reverse leaves the smallest position of each code
+    first[codes[::-1]] = np.arange(len(codes) - 1, -1, -1)
+    return first[codes] == np.arange(len(codes))
+
+def _has_code(codes, present, ncodes):
+    """return a boolean array that is True for each of codes that is one of present"""
+    found = np.zeros(ncodes, dtype=bool)
+    found[present] = True
+    return found[codes]
+
+
+def _select(frame, q):
+    """return the rows of frame that match the query string q"""
+    if getattr(frame, '_indexes', None):
+        res = _index_select(frame, q)
+        if res is not None:
+            return res
+    try:
+        mask = pd.DataFrame.eval(frame, q)
+    except TypeError:
+        # unordered categoricals only support == and !=, so compare their values instead
+        cats = [c for c in frame.columns if isinstance(frame[c].dtype, pd.CategoricalDtype)]
+        if not cats:
+            raise
+        decoded = pd.DataFrame(frame).astype({c: object for c in cats})
+        mask = pd.DataFrame.eval(decoded, q)
+    mask = np.asarray(mask, dtype=bool)
+    # when every row matches the columns of frame are kept as they are instead of copied
+    return frame if mask.all() else frame[mask]
+
+
+def _in_order(frame, args, kwargs):
+    """return True if sort_values(*args, **kwargs) is known to leave the rows of frame where they are"""
+    by = args[0] if args else kwargs.get('by')
+    ascending = args[2] if len(args) > 2 else kwargs.get('ascending', True)
+    if len(args) > 3 or set(kwargs) - {'by', 'ascending', 'kind'} or not isinstance(ascending, (bool, list)):
+        return False
+    if kwargs.get('kind', 'stable') not in ('stable', 'mergesort'):
+        # other sorts may swap rows with equal values
+        return False
+    by = [by] if isinstance(by, str) else list(by)
+    ascending = ascending[0] if isinstance(ascending, list) and len(ascending) == 1 else ascending
+    if len(by) != 1 or by[0] not in frame.columns or isinstance(ascending, list):
+        return False
+    values = frame[by[0]]
+    return values.is_monotonic_increasing if ascending else values.is_monotonic_decreasing
+
+def _sort_key(series):
+    """return float values that order like series, NaN where it is missing, or None if there are none"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = series.cat.codes.to_numpy().astype(float)
+        codes[codes < 0] = np.nan
+        return codes
+    values = series.to_numpy()
+    if values.dtype.kind in 'biuf':
+        return values.astype(float)
+    if values.dtype.kind in 'mM':
+        keys = values.view(np.int64).astype(float)
+        keys[np.isnat(values)] = np.nan
+        return keys
+    try:
+        codes, _ = pd.factorize(series, sort=True)
+    except TypeError:
+        # values that cannot be compared with each other
+        return None
+    codes = codes.astype(float)
+    codes[codes < 0] = np.nan
+    return codes
+
+def _top_rows(frame, limit, args, kwargs):
+    """return the first limit rows of frame.sort_values(*args, **kwargs), which must be a stable sort
+
+    Only the rows whose first sort column is within the limit smallest values, and the rows where it
+    is missing, are sorted, so most of a large frame is passed over once by a partial selection.
+    """
+    by = args[0] if args else kwargs.get('by')
+    ascending = args[2] if len(args) > 2 else kwargs.get('ascending', True)
+    if (len(args) > 3 or set(kwargs) - {'by', 'ascending', 'na_position', 'kind'}
+            or kwargs.get('kind', 'stable') not in ('stable', 'mergesort')):
+        return frame.sort_values(*args, **kwargs).head(limit)
+    by = [by] if isinstance(by, str) else list(by)
+    kwargs = dict(kwargs, by=by, ascending=ascending, kind='stable')
+    keys = _sort_key(frame[by[0]]) if len(frame) > limit > 0 and by[0] in frame.columns else None
+    if keys is None:
+        return frame.sort_values(**kwargs).head(limit)
+    if not (ascending[0] if isinstance(ascending, list) else ascending):
+        keys = -keys
+    missing = np.isnan(keys)
+    present = keys[~missing]
+    if len(present) <= limit:
+        return frame.sort_values(**kwargs).head(limit)
+    # every row after the limit smallest keys sorts behind at least limit rows, ties with the last
+    # of them are kept so the other sort columns and the row order can still decide between them
+    bound = np.partition(present, limit - 1)[limit - 1]
+    candidates = np.flatnonzero((keys <= bound) | missing)
+    return frame.iloc[candidates].sort_values(**kwargs).head(limit)
+
+def _distinct(frame):
+    """return frame without its duplicate rows, frame itself when it has none"""
+    if _profiler is not None:
+        return _profiler.dedup(_distinct_rows, frame)
+    return _distinct_rows(frame)
+
+def _distinct_rows(frame):
+    """see _distinct"""
+    if len(frame) > 1:
+        # equal rows have equal hashes, so when no two hashes are equal the rows are distinct, and
+        # finding that out takes far less memory than drop_duplicates does
+        hashes = np.sort(_row_hashes(frame))
+        if (hashes[1:] != hashes[:-1]).all():
+            return frame
+    duplicated = frame.duplicated().to_numpy()
+    return frame[~duplicated] if duplicated.any() else frame
+
+
+class _HashIndex:
+    """Row positions of a column grouped by value, for == and in lookups -- invisible to end user"""
+    kind = 'hash'
+
+    def __init__(self, values):
+        codes, uniques = pd.factorize(values)
+        # an object Index keeps its hash table between lookups
+        self.uniques = pd.Index(np.asarray(uniques, dtype=object))
+        # positions sorted by value code, missing values (code -1) first
+        self.order = np.argsort(codes, kind='stable')
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        self.starts = np.concatenate([[0], np.cumsum(counts)]) + (codes < 0).sum()
+        self.missing = self.order[:self.starts[0]]
+
+    def lookup(self, values):
+        """return the sorted positions of the rows equal to any of values"""
+        starts, counts = self.matches(pd.unique(np.asarray(values, dtype=object)))
+        return np.sort(self.order[_expand(starts, counts)])
+
+    def matches(self, values):
+        """return where the rows equal to each of values start in order, and how many there are"""
+        codes = self.uniques.get_indexer(values)
+        starts = self.starts[codes]
+        counts = np.where(codes >= 0, self.starts[codes + 1] - starts, 0)
+        return starts, counts
+
+    def remap(self, new_positions):
+        """return this index for the same rows in a new order, new_positions[old] == new"""
+        res = object.__new__(_HashIndex)
+        res.uniques, res.starts, res.order = self.uniques, self.starts, new_positions[self.order]
+        res.missing = new_positions[self.missing]
+        return res
+
+
+class _SortedIndex(_HashIndex):
+    """Row positions of a column sorted by value, for range lookups as well -- invisible to end user"""
+    kind = 'sorted'
+
+    def __init__(self, values):
+        values = np.asarray(values, dtype=object if isinstance(values.dtype, pd.CategoricalDtype) else None)
+        present = pd.notna(values)
+        self.order = np.flatnonzero(present)[np.argsort(values[present], kind='stable')]
+        self.keys = values[self.order]
+        self.missing = np.flatnonzero(~present)
+
+    def matches(self, values):
+        values = np.asarray(values, dtype=object)
+        exact = None
+        if self.keys.dtype.kind in 'biuf':
+            values = np.asarray(values.tolist())
+            if values.dtype.kind not in 'biuf':
+                raise TypeError('cannot look up {} values in a {} index'.format(values.dtype, self.keys.dtype))
+            # a value matches only if casting it to the type of the keys leaves it unchanged, 1.5
+            # must not find the rows with key 1
+            with np.errstate(invalid='ignore'):
+                cast = values.astype(self.keys.dtype)
+            exact, values = cast == values, cast
+        elif self.keys.dtype != object:
+            values = values.astype(self.keys.dtype)
+        starts = np.searchsorted(self.keys, values, 'left')
+        counts = np.searchsorted(self.keys, values, 'right') - starts
+        return starts, counts if exact is None else np.where(exact, counts, 0)
+
+    def range(self, low, low_inclusive, high, high_inclusive):
+        """return the positions of the rows between low and high, either end may be None"""
+        start = 0 if low is None else np.searchsorted(self.keys, low, 'left' if low_inclusive else 'right')
+        stop = len(self.keys) if high is None else np.searchsorted(self.keys, high, 'right' if high_inclusive else 'left')
+        return self.order[start:max(start, stop)]
+
+    def remap(self, new_positions):
+        res = object.__new__(_SortedIndex)
+        res.keys, res.order, res.missing = self.keys, new_positions[self.order], new_positions[self.missing]
+        return res
+
+
+# comparison operators as seen from the column, so that 5 < col becomes col > 5
+_FLIPPED = {ast.Lt: ast.Gt, ast.LtE: ast.GtE, ast.Gt: ast.Lt, ast.GtE: ast.LtE, ast.Eq: ast.Eq, ast.NotEq: ast.NotEq,
+            ast.In: ast.In}
+
+def _index_select(frame, q):
+    """use the indexes of frame to select the rows matching q, or return None to scan instead
+
+    Conjuncts of q that compare an indexed column with literal values using ==, in, <, <=, >
+    or >= are answered from the index, and the rest of q is only evaluated on the rows found.
+    """
+    try:
+        pred = _Predicate(q)
+    except SyntaxError:
+        return None
+    positions, rest = None, []
+    for term in pred.conjuncts():
+        found = _index_term(frame, pred, term)
+        if found is None:
+            rest.append(term)
+        else:
+            positions = found if positions is None else np.intersect1d(positions, found)
+    if positions is None:
+        return None
+    res = pd.DataFrame(frame).iloc[np.sort(positions)]
+    return _select(res, _conjoin(pred, rest)) if rest else res
+
+def _comparisons(pred, term, params=None):
+    """return the attribute a comparison term is about and its conditions, or None
+
+    Only comparisons of a single attribute with literal values, or with the ``@`` parameters given
+    values in params, qualify.  The conditions are ``(op, value)`` pairs that read as
+    ``col op value``, so ``5 < col`` gives ``(ast.Gt, 5)``.
+    """
+    if not isinstance(term, ast.Compare):
+        return None
+    operands = [term.left] + term.comparators
+    names = [i for i, node in enumerate(operands)
+             if isinstance(node, ast.Name) and not node.id.startswith(_LOCAL_PREFIX)]
+    if len(names) != 1:
+        return None
+    col = pred.backticks.get(operands[names[0]].id, operands[names[0]].id).strip('`')
+    try:
+        literals = [None if i in names else _literal(node, params) for i, node in enumerate(operands)]
+    except ValueError:
+        return None
+    conditions = []
+    for i, op in enumerate(term.ops):
+        if i + 1 in names:
+            conditions.append((_FLIPPED.get(type(op)), literals[i]))
+        elif i in names:
+            conditions.append((type(op), literals[i + 1]))
+        else:
+            return None
+    return col, conditions
+
+def _literal(node, params):
+    """return the value of a literal or a bound parameter, ValueError for anything else"""
+    if isinstance(node, ast.Name) and node.id.startswith(_LOCAL_PREFIX) and params is not None:
+        return params[node.id[len(_LOCAL_PREFIX):]]
+    return ast.literal_eval(node)
+
+def _index_term(frame, pred, term, params=None):
+    """return the sorted positions of the rows matching one comparison term, or None"""
+    found = _comparisons(pred, term, params)
+    if found is None or frame._indexes.get(found[0]) is None:
+        return None
+    col, conditions = found
+    index = frame._indexes[col]
+    try:
+        found = None
+        for op, value in conditions:
+            if op in (ast.Eq, ast.In):
+                values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+                if op is ast.In and not isinstance(value, (list, tuple, set)):
+                    return None
+                rows = index.lookup(values)
+            elif op in (ast.Lt, ast.LtE, ast.Gt, ast.GtE) and index.kind == 'sorted':
+                if op in (ast.Lt, ast.LtE):
+                    rows = index.range(None, False, value, op is ast.LtE)
+                else:
+                    rows = index.range(value, op is ast.GtE, None, False)
+                rows = np.sort(rows)
+            else:
+                return None
+            found = rows if found is None else np.intersect1d(found, rows)
+        return found
+    except TypeError:
+        # the literal cannot be compared with the values in the index
+        return None
+
+
+# the fraction of the rows a condition the statistics cannot judge is assumed to select
+_DEFAULT_SELECTIVITY = 1 / 3
+# the number of most common values the statistics of a column keep
+_COMMON_VALUES = 10
+# the number of ranges in the histograms of numeric columns
+_HISTOGRAM_BINS = 100
+
+class _ColumnStats:
+    """Statistics of one column, for estimating the rows a condition selects -- invisible to end user
+
+    All fractions are fractions of all the rows, missing values included.
+    """
+
+    def __init__(self, series, bins):
+        present = series.dropna()
+        counts = present.value_counts()
+        counts = counts[counts > 0]
+        self.rows = len(series)
+        self.nulls = 1 - len(present) / len(series) if len(series) else 0.0
+        self.distinct = len(counts)
+        self.common = {value: n / len(series) for value, n in counts.iloc[:_COMMON_VALUES].items()}
+        if isinstance(present.dtype, pd.CategoricalDtype):
+            # unordered categoricals have no min or max, their values do
+            present = present.astype(present.cat.categories.dtype)
+        try:
+            self.min, self.max = (present.min(), present.max()) if len(present) else (None, None)
+        except TypeError:
+            self.min = self.max = None
+        # the boundaries of bins buckets that each hold the same number of rows
+        self.bounds = None
+        if len(present) and pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+            self.bounds = np.quantile(present.to_numpy(dtype=np.float64), np.linspace(0, 1, bins + 1))
+
+    def equal(self, value):
+        """return the fraction of the rows whose value is value"""
+        if value in self.common:
+            return self.common[value]
+        if self.bounds is not None and not self.bounds[0] <= value <= self.bounds[-1]:
+            return 0.0
+        others = self.distinct - len(self.common)
+        return max(1 - self.nulls - sum(self.common.values()), 0) / others if others > 0 else 0.0
+
+    def below(self, value):
+        """return the fraction of the rows whose value is less than value, from the histogram"""
+        fractions = np.linspace(0, 1, len(self.bounds))
+        return float(np.interp(value, self.bounds, fractions)) * (1 - self.nulls)
+
+    def between(self, low, low_inclusive, high, high_inclusive):
+        """return the fraction of the rows between low and high, either end may be None"""
+        if self.bounds is None:
+            return _DEFAULT_SELECTIVITY
+        upper = 1 - self.nulls if high is None else self.below(high) + (self.equal(high) if high_inclusive else 0)
+        lower = 0 if low is None else self.below(low) + (0 if low_inclusive else self.equal(low))
+        return min(max(upper - lower, 0), 1 - self.nulls)
+
+    def join(self, other):
+        """return the fraction of the pairs of a row of this column and a row of other that are equal
+
+        The common values of either column are matched with their estimated frequency in the other,
+        the rest of the values of the two columns are assumed to be spread evenly over the distinct
+        values of the column that has more.
+        """
+        fraction = sum(f * other.equal(value) for value, f in self.common.items())
+        fraction += sum(f * self.equal(value) for value, f in other.common.items() if value not in self.common)
+        rest = max(1 - self.nulls - sum(self.common.values()), 0)
+        other_rest = max(1 - other.nulls - sum(other.common.values()), 0)
+        distinct = max(self.distinct - len(self.common), other.distinct - len(other.common), 1)
+        return fraction + rest * other_rest / distinct
+
+def _selectivity(stats, pred, tree):
+    """return the estimated fraction of the rows for which an expression tree of a query is true"""
+    if isinstance(tree, ast.BoolOp):
+        parts = [_selectivity(stats, pred, value) for value in tree.values]
+        if isinstance(tree.op, ast.And):
+            return float(np.prod(parts))
+        return 1 - float(np.prod([1 - part for part in parts]))
+    if isinstance(tree, ast.UnaryOp) and isinstance(tree.op, (ast.Not, ast.Invert)):
+        return 1 - _selectivity(stats, pred, tree.operand)
+    found = _comparisons(pred, tree)
+    if found is None or found[0] not in stats:
+        return _DEFAULT_SELECTIVITY
+    column, conditions = stats[found[0]], found[1]
+    fraction, low, high = 1.0, (None, False), (None, False)
+    try:
+        for op, value in conditions:
+            if op is ast.Eq:
+                fraction *= column.equal(value)
+            elif op is ast.NotEq:
+                fraction *= max(1 - column.nulls - column.equal(value), 0)
+            elif op is ast.In:
+                fraction *= min(sum(column.equal(v) for v in value), 1)
+            elif op is ast.NotIn:
+                fraction *= max(1 - column.nulls - sum(column.equal(v) for v in value), 0)
+            elif op in (ast.Lt, ast.LtE):
+                high = (value, op is ast.LtE)
+            elif op in (ast.Gt, ast.GtE):
+                low = (value, op is ast.GtE)
+            else:
+                return _DEFAULT_SELECTIVITY
+        if low[0] is not None or high[0] is not None:
+            fraction *= column.between(low[0], low[1], high[0], high[1])
+    except TypeError:
+        # a value that cannot be compared with the column, or a list that is not a list
+        return _DEFAULT_SELECTIVITY
+    return fraction
+
+# njoin_all considers every join order of up to this many relations, and builds larger ones greedily
+_DP_RELATIONS = 10
+
+def _join_order(relations):
+    """return the order to natural join relations in that keeps the estimated intermediate results smallest
+
+    The relations are joined one at a time, and every relation added must have an attribute in
+    common with the ones before it.  The cost of an order is the sum of the estimated sizes of the
+    results it builds.
+    """
+    stats = [r._statistics([c for c in r.columns if any(c in other.columns for other in relations if other is not r)])
+             for r in relations]
+
+    def grow(size, members, i):
+        # the estimated size of joining relation i to the join of members, None without common attributes
+        common = [c for c in relations[i].columns if any(c in relations[j].columns for j in members)]
+        if not common:
+            return None
+        fraction = 1.0
+        for c in common:
+            # the relation with the fewest distinct values stands for the join of members
+            j = min((j for j in members if c in relations[j].columns), key=lambda j: stats[j][c].distinct)
+            fraction *= stats[j][c].join(stats[i][c])
+        return size * len(relations[i]) * fraction
+
+    n = len(relations)
+    if n <= _DP_RELATIONS:
+        # dynamic programming over the sets of relations joined so far: (cost, size, order)
+        best = {1 << i: (0.0, float(len(r)), [i]) for i, r in enumerate(relations)}
+        for _ in range(n - 1):
+            layer = {}
+            for mask, (cost, size, order) in best.items():
+                for i in range(n):
+                    if mask & (1 << i):
+                        continue
+                    grown = grow(size, order, i)
+                    if grown is not None and (mask | 1 << i not in layer or cost + grown < layer[mask | 1 << i][0]):
+                        layer[mask | 1 << i] = (cost + grown, grown, order + [i])
+            best = layer
+        if not best:
+            raise ValueError("The relations must be connected by columns they have in common")
+        return min(best.values(), key=lambda entry: entry[0])[2]
+    # start with the smallest join of two relations, then keep adding the one that grows it least
+    pairs = [(grow(len(relations[i]), [i], j), [i, j]) for i in range(n) for j in range(n) if i != j]
+    size, order = min(pair for pair in pairs if pair[0] is not None)
+    while len(order) < n:
+        steps = [(grow(size, order, i), i) for i in range(n) if i not in order]
+        steps = [(s, i) for s, i in steps if s is not None]
+        if not steps:
+            raise ValueError("The relations must be connected by columns they have in common")
+        size, i = min(steps)
+        order.append(i)
+    return order
+
+
+def _join_codes(left, right, cols, sort=False):
+    """return int64 codes for the key tuples of left and right, equal tuples get equal codes
+
+    With sort=True the codes are in the same order as the key tuples.  Missing values match each
+    other, as they do in pandas merge.
+    """
+    if len(cols) == 1:
+        lvalues, rvalues = left[cols[0]], right[cols[0]]
+        if (lvalues.dtype == rvalues.dtype and pd.api.types.is_integer_dtype(lvalues.dtype)
+                and not isinstance(lvalues.dtype, pd.CategoricalDtype)):
+            # integers are their own codes
+            return lvalues.to_numpy(dtype=np.int64), rvalues.to_numpy(dtype=np.int64)
+    lcodes = np.zeros(len(left), dtype=np.int64)
+    rcodes = np.zeros(len(right), dtype=np.int64)
+    size = 1
+    for col in cols:
+        both = pd.concat([left[col], right[col]], ignore_index=True)
+        codes, uniques = pd.factorize(both, sort=sort, use_na_sentinel=False)
+        lcodes = lcodes * len(uniques) + codes[:len(left)]
+        rcodes = rcodes * len(uniques) + codes[len(left):]
+        size *= len(uniques)
+        if size > 2 ** 31:
+            # renumber the combined codes before they can overflow
+            codes, uniques = pd.factorize(np.concatenate([lcodes, rcodes]), sort=sort)
+            lcodes, rcodes = codes[:len(left)].astype(np.int64), codes[len(left):].astype(np.int64)
+            size = len(uniques)
+    return lcodes, rcodes
+
+def _expand(starts, counts):
+    """return the positions starts[i] .. starts[i] + counts[i] - 1 for every i, one after another"""
+    total = counts.sum()
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(starts, counts) + offsets
+
+def _hash_join(lcodes, rcodes):
+    """return the matching (left, right) row positions, building a hash table on the smaller side"""
+    if len(lcodes) < len(rcodes):
+        rpos, lpos = _hash_join(rcodes, lcodes)
+        order = np.argsort(lpos, kind='stable')
+        return lpos[order], rpos[order]
+    # build on the right, probe with the left so the pairs come out in left order
+    groups, uniques = pd.factorize(rcodes)
+    order = np.argsort(groups, kind='stable')
+    counts = np.bincount(groups, minlength=len(uniques))
+    starts = np.cumsum(counts) - counts
+    slots = pd.Index(uniques).get_indexer(lcodes)
+    lpos = np.flatnonzero(slots >= 0)
+    slots = slots[lpos]
+    return np.repeat(lpos, counts[slots]), order[_expand(starts[slots], counts[slots])]
+
+def _hash_positions(lcodes, rcodes):
+    """return the matching (left, right) row positions of a hash join, in parallel for large inputs"""
+    if _parallel(len(lcodes) + len(rcodes)):
+        return _parallel_hash_join(lcodes, rcodes)
+    return _hash_join(lcodes, rcodes)
+
+def _parallel_hash_join(lcodes, rcodes):
+    """return the matching (left, right) row positions, hash joining partitions of the keys in parallel"""
+    lparts, rparts = _hash_partition(lcodes, _workers), _hash_partition(rcodes, _workers)
+    pairs = _map(_hash_join, [(lcodes[l], rcodes[r]) for l, r in zip(lparts, rparts)])
+    lpos = np.concatenate([l[a] for l, (a, b) in zip(lparts, pairs)])
+    rpos = np.concatenate([r[b] for r, (a, b) in zip(rparts, pairs)])
+    # the matches of one left row all come from one partition, already in right order
+    order = np.argsort(lpos, kind='stable')
+    return lpos[order], rpos[order]
+
+def _merge_join(lcodes, rcodes):
+    """return the matching (left, right) row positions by merging the two sides in key order
+
+    Sides that are already in key order, for example after Relation.sort, are not sorted again.
+    """
+    lorder = None if np.all(lcodes[1:] >= lcodes[:-1]) else np.argsort(lcodes, kind='stable')
+    rorder = None if np.all(rcodes[1:] >= rcodes[:-1]) else np.argsort(rcodes, kind='stable')
+    lvalues, _, lcounts = _runs(lcodes if lorder is None else lcodes[lorder])
+    rvalues, rstarts, rcounts = _runs(rcodes if rorder is None else rcodes[rorder])
+    # match each run of equal left keys with the run of the same key on the right
+    slots = np.searchsorted(rvalues, lvalues).clip(max=max(len(rvalues) - 1, 0))
+    matched = rcounts[slots] * (rvalues[slots] == lvalues) if len(rvalues) else np.zeros(len(lvalues), dtype=np.intp)
+    counts = np.repeat(matched, lcounts)
+    lpos = np.repeat(np.arange(len(lcodes)) if lorder is None else lorder, counts)
+    rpos = _expand(np.repeat(rstarts[slots], lcounts), counts) if len(rvalues) else np.array([], dtype=np.intp)
+    if rorder is not None:
+        rpos = rorder[rpos]
+    if lorder is not None:
+        order = np.argsort(lpos, kind='stable')
+        lpos, rpos = lpos[order], rpos[order]
+    return lpos, rpos
+
+def _runs(values):
+    """return the distinct values of a sorted array, with the start and length of each run of them"""
+    starts = np.flatnonzero(np.concatenate([[True], values[1:] != values[:-1]])) if len(values) else np.array([], dtype=np.intp)
+    counts = np.diff(np.append(starts, len(values)))
+    return values[starts], starts, counts
+
+def _index_join(left, right, cols, index, col):
+    """return the matching (left, right) row positions by looking up every left key in the index
+    that right has on col, then checking the other join columns"""
+    groups, values = pd.factorize(left[col])
+    starts, counts = index.matches(np.asarray(values, dtype=object))
+    # missing keys have group -1, which picks the missing values of the index, kept after order
+    rows = np.concatenate([index.order, index.missing])
+    starts = np.append(starts, len(index.order))[groups]
+    counts = np.append(counts, len(index.missing))[groups]
+    lpos = np.repeat(np.arange(len(left)), counts)
+    rpos = rows[_expand(starts, counts)]
+    # pandas returns the matches of a left row in right row order
+    order = np.lexsort((rpos, lpos))
+    lpos, rpos = lpos[order], rpos[order]
+    keep = np.ones(len(lpos), dtype=bool)
+    for other in cols:
+        if other != col:
+            lvalues = np.asarray(left[other], dtype=object)[lpos]
+            rvalues = np.asarray(right[other], dtype=object)[rpos]
+            keep &= (lvalues == rvalues) | (pd.isna(lvalues) & pd.isna(rvalues))
+    return lpos[keep], rpos[keep]
+
+def _join_positions(left, right, cols, algorithm, indexes=None):
+    """return the matching (left, right) row positions of an equi-join on cols, in pandas merge order
+
+    indexes are the indexes of the relation right was taken from.
+    """
+    indexes = indexes or {}
+    indexed = [c for c in cols if c in indexes]
+    if algorithm == 'auto':
+        algorithm = _join_algorithm(left, right, cols, indexes)
+    if algorithm == 'index':
+        if not indexed:
+            raise ValueError("algorithm='index' needs an index on a join attribute of the other relation")
+        return _index_join(left, right, cols, indexes[indexed[0]], indexed[0])
+    if algorithm == 'merge':
+        return _merge_join(*_join_codes(left, right, cols, sort=True))
+    if algorithm == 'hash':
+        return _hash_positions(*_join_codes(left, right, cols))
+    raise ValueError("algorithm must be 'auto', 'hash', 'merge' or 'index'")
+
+def _join_algorithm(left, right, cols, indexes):
+    """return the join algorithm 'auto' picks for joining left and right on cols"""
+    if [c for c in cols if c in indexes] and len(left) * 10 < len(right):
+        return 'index'
+    if len(cols) == 1 and left[cols[0]].is_monotonic_increasing and right[cols[0]].is_monotonic_increasing:
+        return 'merge'
+    return 'hash'
+
+def _match_counts(lcodes, rcodes):
+    """return the number of right rows every left row matches"""
+    groups, uniques = pd.factorize(rcodes)
+    counts = np.bincount(groups, minlength=len(uniques))
+    slots = pd.Index(uniques).get_indexer(lcodes)
+    return np.where(slots >= 0, counts[np.maximum(slots, 0)] if len(counts) else 0, 0)
+
+# the number of rows _row_bytes measures the strings and other objects of
+_ROW_SAMPLE = 1000
+
+def _row_bytes(frame):
+    """return the average number of bytes a row of frame takes
+
+    Measuring the strings of every row costs about as much as a join, so the columns that hold
+    objects are measured on a sample of evenly spaced rows.
+    """
+    sizes = frame.memory_usage(index=False)
+    deep = [c for c in frame.columns if frame[c].dtype == object or pd.api.types.is_string_dtype(frame[c].dtype)]
+    if deep and len(frame) > _ROW_SAMPLE:
+        sample = frame[deep].iloc[::len(frame) // _ROW_SAMPLE]
+        sizes[deep] = sample.memory_usage(index=False, deep=True) * (len(frame) / len(sample))
+    elif deep:
+        sizes[deep] = frame[deep].memory_usage(index=False, deep=True)
+    return int(sizes.sum()) / max(len(frame), 1)
+
+def _grace_join(left, right, cols, algorithm, indexes):
+    """return the joined rows, built a partition at a time through temporary files when they do not
+    fit the memory limit, or None when the join does not hash or there is no limit, see
+    set_memory_limit"""
+    if _memory_limit is None or algorithm not in ('auto', 'hash'):
+        return None
+    if algorithm == 'auto' and _join_algorithm(left, right, cols, indexes or {}) != 'hash':
+        return None
+    lcodes, rcodes = _join_codes(left, right, cols)
+    counts = _match_counts(lcodes, rcodes)
+    total = int(counts.sum())
+    extra = [c for c in right.columns if c not in cols]
+    # every joined row is built along with its left and right positions
+    row_bytes = _row_bytes(left) + _row_bytes(right[extra]) + 16
+    if total * row_bytes <= _memory_limit:
+        return _join_frame(left, right, cols, *_hash_positions(lcodes, rcodes))
+    # pieces much smaller than this would spend more time on overhead than on joining
+    budget = max(_memory_limit // 4, _SPILL_MIN_BYTES)
+    parts = int(min(max(-(-total * row_bytes // budget), 1), 2 ** 16 - 1))
+    columns = list(left.columns) + extra
+    with tempfile.TemporaryDirectory(dir=_spill_dir) as directory:
+        chunks = _spill_join(left, right, cols, columns, lcodes, rcodes, counts, parts, max(int(budget // row_bytes), 1), directory)
+        # the positions of the partitions are no longer needed while the result is merged
+        del lcodes, rcodes, counts
+        data = {col: _merge_column(directory, chunks, i, total) for i, col in enumerate(columns)}
+    return pd.DataFrame(data, copy=False)
+
+def _merge_column(directory, chunks, i, total):
+    """return column i of a joined result from the chunks _spill_join wrote to directory"""
+    dests = [os.path.join(directory, '{}.npy'.format(n)) for n in range(chunks)]
+    paths = [os.path.join(directory, '{}-{}.pkl'.format(n, i)) for n in range(chunks)]
+    first = pd.read_pickle(paths[0])
+    if isinstance(first.dtype, pd.CategoricalDtype) or isinstance(first.dtype, np.dtype):
+        # numbers and category codes are put in place one chunk at a time
+        categories = first.dtype if isinstance(first.dtype, pd.CategoricalDtype) else None
+        out = np.empty(total, dtype=first.cat.codes.dtype if categories is not None else first.dtype)
+        for dest, path in zip(dests, paths):
+            values = pd.read_pickle(path)
+            out[np.load(dest)] = values.cat.codes.to_numpy() if categories is not None else values.to_numpy()
+        if categories is not None:
+            return pd.Series(pd.Categorical.from_codes(out, dtype=categories), name=first.name)
+        return pd.Series(out, name=first.name, copy=False)
+    order, done = np.empty(total, dtype=np.intp), 0
+    for dest in dests:
+        positions = np.load(dest)
+        order[positions] = np.arange(done, done + len(positions))
+        done += len(positions)
+    values = pd.concat([pd.read_pickle(path) for path in paths], ignore_index=True)
+    return values.take(order).reset_index(drop=True)
+
+def _spill_join(left, right, cols, columns, lcodes, rcodes, counts, parts, rows_per_chunk, directory):
+    """join the hash partitions of left and right one at a time and write the columns of the joined rows
+    to directory, along with where they go in the result, return the number of chunks written"""
+    # where the matches of every left row go in the result, which is in left row order
+    offsets = np.cumsum(counts) - counts
+    chunks = 0
+    for lrows, rrows in zip(_hash_partition(lcodes, parts), _hash_partition(rcodes, parts)):
+        if not len(lrows) or not len(rrows):
+            continue
+        # a skewed key can give one partition far more matches than the others, so its left rows
+        # are joined in slices whose matches fit the budget
+        sizes = np.cumsum(counts[lrows])
+        for rows in np.split(lrows, np.searchsorted(sizes, np.arange(rows_per_chunk, sizes[-1], rows_per_chunk))):
+            lpos, rpos = _hash_join(lcodes[rows], rcodes[rrows])
+            if not len(lpos):
+                continue
+            lpos, rpos = rows[lpos], rrows[rpos]
+            _, starts, runs = _runs(lpos)
+            np.save(os.path.join(directory, '{}.npy'.format(chunks)), offsets[lpos] + np.arange(len(lpos)) - np.repeat(starts, runs))
+            chunk = _join_frame(left, right, cols, lpos, rpos)
+            for i, col in enumerate(columns):
+                chunk[col].to_pickle(os.path.join(directory, '{}-{}.pkl'.format(chunks, i)))
+            chunks += 1
+    return chunks
+
+def _join_frame(left, right, cols, lpos, rpos):
+    """build the joined rows: the left columns, then the right columns that are not join columns"""
+    res = pd.DataFrame(left).take(lpos)
+    res.index = pd.RangeIndex(len(lpos))
+    extra = [c for c in right.columns if c not in cols]
+    if not extra:
+        return res
+    more = pd.DataFrame(right[extra]).take(rpos)
+    more.index = res.index
+    return pd.concat([res, more], axis=1)
+
+
+class _ResultCache:
+    """least recently used operator results, within a number of entries and bytes -- invisible to end user"""
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries, self.max_bytes = max_entries, max_bytes
+        self.entries = collections.OrderedDict()
+        self.nbytes = 0
+
+    def get(self, key):
+        """return the result stored for key, or None"""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, result):
+        """store result for key, dropping the least recently used results to make room"""
+        nbytes = int(result.memory_usage(index=True, deep=True).sum())
+        if self.max_bytes is not None and nbytes > self.max_bytes:
+            return
+        self.entries[key] = (result, nbytes)
+        self.nbytes += nbytes
+        while len(self.entries) > self.max_entries or (self.max_bytes is not None and self.nbytes > self.max_bytes):
+            self.nbytes -= self.entries.popitem(last=False)[1][1]
+
+
+def _operator(method):
+    """look up the results of a Relation or GroupWrap operator in the result cache when it is on, and
+    record it in the profile when there is one"""
+    @functools.wraps(method)
+    def cached(self, *args, **kwargs):
+        if _result_cache is None:
+            return method(self, *args, **kwargs)
+        try:
+            key = (method.__qualname__, _cache_token(self), _cache_token(args), _cache_token(kwargs))
+        except TypeError:
+            # an argument or relation that cannot be fingerprinted
+            return method(self, *args, **kwargs)
+        res = _result_cache.get(key)
+        if res is None:
+            res = method(self, *args, **kwargs)
+            # the contents of the result are known from how it was computed, so it is never hashed,
+            # and the state it has now tells later whether the caller has changed it since
+            res._fingerprint = (hashlib.sha1(repr(key).encode()).digest(), _frame_state(res))
+            _result_cache.put(key, _cache_copy(res))
+            return res
+        return _cache_copy(res)
+
+    @functools.wraps(method)
+    def profiled(self, *args, **kwargs):
+        if _profiler is None:
+            return cached(self, *args, **kwargs)
+        inputs = [self] + [a for a in args if isinstance(a, (pd.DataFrame, GroupWrap))]
+        detail = ', '.join([_brief(a) for a in args] + ['{}={}'.format(k, _brief(v)) for k, v in kwargs.items()])
+        return _profiler.run(method.__name__, detail, inputs, cached, self, *args, **kwargs)
+    return profiled
+
+def _cache_copy(res):
+    """return a new Relation that shares the data of res until either of them is changed, or a copy of
+    the data when pandas would change it in place, see _copy_on_write"""
+    copy = _relation(res.copy(deep=not _copy_on_write()), None if res._key is None else list(res._key), res._indexes and dict(res._indexes))
+    copy._fingerprint = (res._fingerprint[0], _frame_state(copy))
+    return copy
+
+def _cache_token(value):
+    """return a hashable stand-in for an operator argument, TypeError when there is none"""
+    if isinstance(value, pd.DataFrame):
+        key = getattr(value, '_key', None)
+        # the indexes decide which join algorithms can run, and are carried to some results
+        indexes = tuple(sorted((c, 'sorted' if isinstance(i, _SortedIndex) else 'hash')
+                               for c, i in (getattr(value, '_indexes', None) or {}).items()))
+        return ('relation', _fingerprint(value), None if key is None else tuple(key), indexes)
+    if isinstance(value, GroupWrap):
+        return ('groupby', _cache_token(value.gbo.obj), _cache_token(value.gb_cols))
+    if isinstance(value, pd.Series):
+        return ('series', value.name, str(value.dtype), _content_digest(value))
+    if isinstance(value, str) and '@' in value:
+        # the value of a local variable is not part of the query string
+        raise TypeError('query refers to local variables')
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return (type(value).__name__,) + tuple(_cache_token(v) for v in value)
+    if isinstance(value, dict):
+        return ('dict',) + tuple(sorted((k, _cache_token(v)) for k, v in value.items()))
+    raise TypeError('cannot fingerprint {}'.format(type(value).__name__))
+
+def _fingerprint(frame):
+    """return a digest of the contents of a relation, remembered on it until it is changed"""
+    state = _frame_state(frame)
+    memo = getattr(frame, '_fingerprint', None)
+    if memo is not None and _same_state(memo[1], state):
+        return memo[0]
+    digest = _content_digest(frame)
+    if isinstance(frame, Relation):
+        frame._fingerprint = (digest, state)
+    return digest
+
+def _content_digest(data):
+    """return a digest of the labels, types and values of a DataFrame or Series"""
+    if isinstance(data, pd.Series):
+        labels = (data.name, str(data.dtype))
+    else:
+        labels = (list(data.columns), [str(dtype) for dtype in data.dtypes])
+    digest = hashlib.sha1(repr(labels).encode())
+    digest.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    return digest.digest()
+
+def _frame_state(frame):
+    """return what identifies the current data of frame: its labels and the arrays holding its values
+
+    A shallow copy is kept with them, so that pandas copy on write gives frame new arrays instead of
+    changing the ones it has, and every change is seen as a change of state.
+    """
+    return frame.copy(deep=False), frame.index, frame.columns, [block.values for block in frame._mgr.blocks]
+
+def _same_state(old, new):
+    """return True if two states of _frame_state are known to hold the same data"""
+    # without copy on write a cell can be changed in the arrays frame already has
+    return _copy_on_write() and (old[1] is new[1] and old[2] is new[2] and len(old[3]) == len(new[3])
+            and all(a is b for a, b in zip(old[3], new[3])))
+
+
+def _copy_on_write():
+    """return True when pandas gives a frame that is changed new arrays, instead of changing the arrays
+    it may share with other frames: always from pandas 3, with the copy_on_write option before"""
+    if int(pd.__version__.split('.')[0]) >= 3:
+        return True
+    return pd.get_option('mode.copy_on_write') is True
+
+
+@contextlib.contextmanager
+def profile(memory=True):
+    """Record every operator run in a with block, with its time, rows and memory
+
+    ``with profile() as p:`` gives a Profile, which is filled in as the operators run.  Print it to
+    see the operators as a tree, each under the operator whose result it used or that called it, or
+    export it with ``p.to_json()``.  Lazy plans are recorded one plan node at a time, see also
+    LazyRelation.explain.  When no profile is active the operators only check that it is not.
+
+    :param memory: Boolean, memory=False leaves out the bytes allocated, which are measured with
+        tracemalloc and make Python allocate memory more slowly
+    :return: a Profile
+
+    :Example:
+
+    >>> from reframe import Relation, profile
+    >>> country = Relation('country.csv')
+    >>> with profile() as p:
+    ...     res = country.query('continent == "Asia"').project(['region'])
+    >>> [(r['operator'], r['input_rows'], r['output_rows']) for r in p.walk()]
+    [('project', [51], 4), ('query', [239], 51)]
+    >>>
+    """
+    global _profiler
+    previous, _profiler = _profiler, Profile(memory)
+    started = memory and not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        yield _profiler
+    finally:
+        _profiler = previous
+        if started:
+            tracemalloc.stop()
+
+
+class Profile:
+    """The operators recorded by profile or LazyRelation.explain
+
+    ``roots`` holds one record for every operator whose result no other recorded operator used.  A
+    record is a dict with the keys
+
+    * ``operator`` and ``detail``: the name of the operator or plan node and its arguments
+    * ``seconds``: the wall time of the operator, including the operators it called
+    * ``self_seconds``: the wall time without the operators it called
+    * ``dedup_seconds``: the part of self_seconds spent dropping duplicate rows
+    * ``input_rows`` and ``output_rows``: the number of rows of the input relations and of the result
+    * ``bytes``: the memory allocated by the operator and still in use when it returned, None if not
+      measured
+    * ``children``: the records of the operators it called and of those that made its inputs
+
+    Records of a plan that was only explained, not run, have None for the measurements.
+    """
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.roots = []
+        self._stack = []
+        # the record of the operator that made each result, while the result is alive
+        self._made = {}
+
+    def _allocated(self):
+        """return the bytes allocated by Python, numpy and pyarrow so far, or None"""
+        if not self.memory or not tracemalloc.is_tracing():
+            return None
+        pyarrow = sys.modules.get('pyarrow')
+        return tracemalloc.get_traced_memory()[0] + (pyarrow.total_allocated_bytes() if pyarrow else 0)
+
+    def run(self, operator, detail, inputs, func, *args, **kwargs):
+        """return func(*args, **kwargs), recording it as operator with the input relations inputs"""
+        record = {'operator': operator, 'detail': detail, 'seconds': None, 'self_seconds': None,
+                  'dedup_seconds': 0.0, 'input_rows': None if inputs is None else [len(_rows(x)) for x in inputs],
+                  'output_rows': None, 'bytes': None, 'children': []}
+        siblings = self._stack[-1]['children'] if self._stack else self.roots
+        self._stack.append(record)
+        allocated = self._allocated()
+        start = time.perf_counter()
+        try:
+            res = func(*args, **kwargs)
+        finally:
+            record['seconds'] = time.perf_counter() - start
+            if allocated is not None:
+                record['bytes'] = self._allocated() - allocated
+            self._stack.pop()
+        called = record['children']
+        record['self_seconds'] = record['seconds'] - sum(child['seconds'] for child in called)
+        if inputs is None:
+            # a plan node, whose inputs are the plan nodes run inside it
+            record['input_rows'] = [child['output_rows'] for child in called if child.get('plan')]
+            record['plan'] = True
+        record['output_rows'] = len(_rows(res)) if isinstance(res, (pd.DataFrame, GroupWrap)) else None
+        # the operators that made the inputs are shown below the one that used them
+        for x in inputs or []:
+            made = self._made.get(id(x))
+            if (made is not None and made[0]() is x and not made[1].get('plan')
+                    and any(made[1] is r for r in siblings)):
+                siblings[:] = [r for r in siblings if r is not made[1]]
+                called.insert(0, made[1])
+        siblings.append(record)
+        try:
+            self._made[id(res)] = (weakref.ref(res), record)
+        except TypeError:
+            pass
+        return res
+
+    def dedup(self, func, frame):
+        """return func(frame), adding its time to the dedup time of the running operator"""
+        start = time.perf_counter()
+        try:
+            return func(frame)
+        finally:
+            if self._stack:
+                self._stack[-1]['dedup_seconds'] += time.perf_counter() - start
+
+    def walk(self, records=None):
+        """return all the records, each followed by those of its children"""
+        found = []
+        for record in self.roots if records is None else records:
+            found.append(record)
+            found.extend(self.walk(record['children']))
+        return found
+
+    def to_json(self, **kwargs):
+        """return the records as a JSON string, keyword arguments are passed on to json.dumps"""
+        strip = lambda r: dict({k: v for k, v in r.items() if k not in ('children', 'plan')},
+                               children=[strip(c) for c in r['children']])
+        return json.dumps({'operators': [strip(r) for r in self.roots]}, **kwargs)
+
+    def tree(self):
+        """return the records as an indented tree, one line per operator"""
+        return '\n'.join(self._lines(self.roots, 0))
+
+    def _lines(self, records, depth):
+        """return the lines of tree for records and their children"""
+        lines = []
+        for record in records:
+            line = '  ' * depth + '{}({})'.format(record['operator'], record['detail'])
+            if record['seconds'] is not None:
+                line += '  {:.2f} ms (self {:.2f} ms, dedup {:.2f} ms)'.format(
+                    record['seconds'] * 1000, record['self_seconds'] * 1000, record['dedup_seconds'] * 1000)
+                line += '  rows {} -> {}'.format(' x '.join(str(n) for n in record['input_rows']) or '-', record['output_rows'])
+                if record['bytes'] is not None:
+                    line += '  {:.1f} KB'.format(record['bytes'] / 1024)
+            lines.append(line)
+            lines.extend(self._lines(record['children'], depth + 1))
+        return lines
+
+    def __str__(self):
+        return self.tree()
+
+    def __repr__(self):
+        return self.tree()
+
+def _rows(value):
+    """return the relation of an operator input, the relation a GroupWrap groups for a GroupWrap"""
+    return value.gbo.obj if isinstance(value, GroupWrap) else value
+
+def _brief(value):
+    """return a short description of an operator argument"""
+    if isinstance(value, pd.DataFrame):
+        return 'relation'
+    if isinstance(value, LazyRelation):
+        return 'lazy relation'
+    text = repr(value)
+    return text if len(text) <= 60 else text[:57] + '...'
+
+
+class Relation(pd.DataFrame):
+    """Create a Relation from a csv file of data for use with relational operators
+
+    This module is designed for educational purposes, specifically teaching and experimenting
+    with relational algebra.  To that end, you can create a relation from a file of data typically
+    a csv file, although you can also specify a separator, for example a vertical bar may be
+    better in some cases.
+
+    This module is built on top of the pandas system in in many cases is just a thin shell.
+
+    - **parameters**::
+
+    :param filepath: a string specifying a path to a csv file, OR a Pandas DataFrame to convert to a Relation
+    :param sep: specify a separator for the data file.  default is ``|``
+    :param key: an attribute or list of attributes whose values are unique in every row, for example ``'code'``
+
+    String columns with few distinct values, such as ``continent`` and ``region``, can be stored as
+    categoricals when the file is loaded, see CATEGORY_RATIO.
+
+    Declaring a key tells the operators that the relation has no duplicate rows, so ``query``,
+    ``rename`` and any ``project`` that keeps the key can skip dropping duplicates.
+
+    Operators that keep every row share the columns of their input instead of copying them, so the
+    memory a chain of them uses does not grow with the length of the chain.  This needs pandas copy on
+    write, which is always on from pandas 3; older versions copy in ``project`` and ``rename``.
+    """
+    # _key is None when the relation may contain duplicate rows, otherwise it is a list of attributes
+    # that identify each row.  Operators that drop duplicates know their result is distinct on all
+    # of its attributes.
+    _metadata = ['_key', '_indexes']
+    _key = None
+    # a dict from attribute name to the index created on it with create_index, or None
+    _indexes = None
+    # the digest of the contents of the relation and the state it was computed for, see _fingerprint
+    _fingerprint = None
+    # the state of the relation and a dict from attribute name to its statistics, see analyze
+    _stats = None
+
+    def __init__(self, filepath=None, sep='|', key=None):
+        if type(filepath) == str:
+            super().__init__(_load_csv(filepath, sep))
+        elif isinstance(filepath, pd.DataFrame):
+            # wrap the columns of the frame, operators that leave a column alone share it with their input
+            super().__init__(filepath, copy=False)
+            if isinstance(filepath, Relation):
+                self._indexes = filepath._indexes
+                if key is None:
+                    self._key = filepath._key
+        else:
+            print('help')
+        if key is not None:
+            key = [key] if type(key) == str else list(key)
+            if self.duplicated(key).any():
+                raise ValueError("{} is not a key of the relation".format(key))
+            self._key = key
+
+    def _distinct_on(self, cols):
+        """return True if the rows of self are known to be distinct on the columns in cols"""
+        return self._key is not None and set(self._key) <= set(cols)
+            
+    @_operator
+    def project(self, cols):
+        """returns a new Relation with only the specified columns
+
+        :param cols: a list of columns to project
+        :return: a Relation with duplicate rows dropped
+
+        :Example:
+
+        >>> from reframe import Relation
+        >>> country = Relation('country.csv')
+        >>> country.project(['region','continent','name']).head(10)
+                              region      continent                  name
+        0  Southern and Central Asia           Asia           Afghanistan
+        1             Western Europe         Europe           Netherlands
+        2                  Caribbean  North America  Netherlands Antilles
+        3            Southern Europe         Europe               Albania
+        4            Northern Africa         Africa               Algeria
+        5                  Polynesia        Oceania        American Samoa
+        6            Southern Europe         Europe               Andorra
+        7             Central Africa         Africa                Angola
+        8                  Caribbean  North America              Anguilla
+        9                  Caribbean  North America   Antigua and Barbuda
+        >>>
+
+        .. note:: Relations have no duplicate rows, so projecting a single column creates a relation with all of the distinct values for that column
+        """
+        if type(cols) != list:
+            raise ValueError("You must provide the attributes to project inside square brackets []")
+        for name in cols:
+            if name not in self.columns:
+                raise ValueError("'{}' is not a valid attribute name in relation".format(name))
+        # while no rows are dropped the indexes on the remaining columns still apply
+        indexes = {c: i for c, i in (self._indexes or {}).items() if c in cols}
+        if self._distinct_on(cols):
+            return _relation(self[cols], self._key, indexes)
+        res = self[cols]
+        distinct = _distinct(res)
+        return _relation(distinct, cols, indexes if distinct is res else None)
+    
+    @_operator
+    def query(self, q):
+        """return a new relation with tuples matching the query condition
+
+        :param q:  a query string
+        :return: a Relation
+
+        :Example:
+
+        >>> from reframe import Relation
+        >>> country = Relation('country.csv')
+        >>> country.query('continent == "Antarctica"').project(['code','name'])
+            code                                          name
+        232  ATA                                    Antarctica
+        233  BVT                                 Bouvet Island
+        235  SGS  South Georgia and the South Sandwich Islands
+        236  HMD             Heard Island and McDonald Islands
+        237  ATF                   French Southern territories
+        >>>
+
+        """
+        res = _select(self, q)
+        if self._key is not None:
+            return _relation(res, self._key)
+        return _relation(_distinct(res), list(res.columns))
+
+    @_operator
+    def sort(self, *args, limit=None, **kwargs):
+        """sort the relation on the given columns
+
+        :param cols:  A list of columns to sort on
+        :param ascending:  Boolean, ascending=False implies a sort in reverse order
+        :param limit:  Only return the first limit rows of the sorted relation.  The rest are never
+            sorted, which is much faster than sorting everything and calling head.
+
+        The sort is stable unless another ``kind`` is given: rows that tie on every sort column keep
+        the order they have in the relation, with or without a limit.
+
+        :Example:
+
+        >>> from reframe import Relation
+        >>> country = Relation('country.csv')
+        >>> country.sort(['indepyear'], ascending=False).query('indepyear < 1200').project(['name','indepyear'])
+                       name  indepyear
+        159        Portugal       1143
+        29   United Kingdom       1066
+        180      San Marino        885
+        164          France        843
+        170          Sweden        836
+        200         Denmark        800
+        81            Japan       -660
+        48         Ethiopia      -1000
+        93            China      -1523
+
+        >>> country.sort('population', ascending=False, limit=3).project(['name','population'])
+                      name  population
+        93           China  1277558000
+        71           India  1013662000
+        228  United States   278357000
+
+        A limit gives the same rows, ties included, as sorting everything and calling head:
+
+        >>> all(country.sort('lifeexpectancy', ascending=up, limit=10).index.equals(country.sort('lifeexpectancy', ascending=up).head(10).index)
+        ...     for up in (True, False))
+        True
+
+        """
+
+        if len(args) < 5:
+            kwargs.setdefault('kind', 'stable')
+        if limit is not None:
+            # the row positions in the indexes are not worth moving for the few rows that are left
+            if _in_order(self, args, kwargs):
+                return _relation(self.head(limit), self._key)
+            return _relation(_top_rows(self, limit, args, kwargs), self._key)
+        if _in_order(self, args, kwargs):
+            # nothing moves, so the relation keeps its columns and its indexes stay valid
+            return _relation(self, self._key, self._indexes)
+        res = super().sort_values(*args, **kwargs)
+        indexes = None
+        if self._indexes and self.index.is_unique:
+            # move the row positions stored in the indexes to where sort put the rows
+            new_positions = np.empty(len(self), dtype=np.intp)
+            new_positions[self.index.get_indexer(res.index)] = np.arange(len(res))
+            indexes = {c: i.remap(new_positions) for c, i in self._indexes.items()}
+        return _relation(res, self._key, indexes)
+
+    @_operator
+    def intersect(self, other, algorithm='auto'):
+        """Create a new relation that is the intersection of the two given relations
+
+        In order to compute the intersection the relations must be union compatible.  That is they must
+        have exactly the same columns.  This may require some projecting and renaming.
+
+        The result is distinct.  By default every row of both relations is hashed once and the rows
+        are matched on their hashes, the njoin algorithms ``'hash'``, ``'merge'`` and ``'index'`` can
+        be chosen instead, for example to look up a few rows in an index of a large relation.
+
+        :param other:  The relation to compute the intersection with.
+        :param algorithm: ``'auto'`` to match the rows by their hashes, or an algorithm of njoin
+        :return:
+
+        :Example:
+
+        >>> from reframe import Relation
+        >>> country = Relation('country.csv')
+        >>> country.query('continent == "Africa"').project(['name', 'region']).intersect(country.query('region == "Western Africa"').project(['name', 'region']))
+                     name          region
+        0           Benin  Western Africa
+        1    Burkina Faso  Western Africa
+        2          Gambia  Western Africa
+        3           Ghana  Western Africa
+        4          Guinea  Western Africa
+        5   Guinea-Bissau  Western Africa
+        6      Cape Verde  Western Africa
+        7         Liberia  Western Africa
+        8            Mali  Western Africa
+        9      Mauritania  Western Africa
+        10          Niger  Western Africa
+        11        Nigeria  Western Africa
+        12  Côte d'Ivoire  Western Africa
+        13   Saint Helena  Western Africa
+        14        Senegal  Western Africa
+        15   Sierra Leone  Western Africa
+        16           Togo  Western Africa
+        >>>
+        """
+        if sorted(self.columns) != sorted(other.columns):
+            raise ValueError("Relations must be Union compatible")
+        if not isinstance(other, Relation):
+            other = Relation(other)
+        cols = list(self.columns)
+        left, right = _align_categories(self, other[cols], cols)
+        if algorithm == 'auto':
+            codes, ncodes = _row_codes(left, right, cols)
+            lcodes = codes[:len(left)]
+            keep = _has_code(lcodes, codes[len(left):], ncodes)
+        else:
+            lpos, rpos = _join_positions(left, right, cols, algorithm, other._indexes)
+            keep = np.zeros(len(left), dtype=bool)
+            keep[lpos] = True
+            if self._key is None:
+                lcodes, ncodes = _row_codes(left, left.iloc[:0], cols)
+        if self._key is None:
+            keep &= _first_rows(lcodes, ncodes)
+        return _relation(left[keep].reset_index(drop=True), self._key or cols)
+
+    @_operator
+    def njoin(self, other, algorithm='auto'):
+        """Create a new relation that is the natural join of the two given relations
+
+        Rows of the two relations are paired when they have the same values for every attribute the
+        relations have in common.  The relations must have at least one attribute in common.
+
+        The algorithm used to find the pairs can be chosen:
+
+        * ``'hash'`` builds a hash table on the smaller relation and probes it with the other
+        * ``'merge'`` merges the two relations in key order, and does not sort a relation that is
+          already sorted on the join attribute
+        * ``'index'`` looks up each row in an index of other, see create_index, which is fastest
+          when this relation is much smaller than other
+        * ``'auto'`` picks one of these from the sizes, sort order and indexes of the relations
+
+        :param other:  The relation to join with.
+        :param algorithm: ``'auto'``, ``'hash'``, ``'merge'`` or ``'index'``
+        :return:
+
+        :Example:
+
+        >>> from reframe import Relation
+        >>> country = Relation('country.csv')
+        >>> country.query('continent == "Africa"').project(['name', 'region']).njoin(country.query('region == "Western Africa"').project(['name', 'region']))
+                     name          region
+        0           Benin  Western Africa
+        1    Burkina Faso  Western Africa
+        2          Gambia  Western Africa
+        3           Ghana  Western Africa
+        4          Guinea  Western Africa
+        5   Guinea-Bissau  Western Africa
+        6      Cape Verde  Western Africa
+        7         Liberia  Western Africa
+        8            Mali  Western Africa
+        9      Mauritania  Western Africa
+        10          Niger  Western Africa
+        11        Nigeria  Western Africa
+        12  Côte d'Ivoire  Western Africa
+        13   Saint Helena  Western Africa
+        14        Senegal  Western Africa
+        15   Sierra Leone  Western Africa
+        16           Togo  Western Africa
+        >>>
+        """
+        col_list = [x for x in self.columns if x in other.columns]
+        if not col_list:
+            raise ValueError("The two relations must have some columns in common")
+        if not isinstance(other, Relation):
+            other = Relation(other)
+        key = None
+        if self._key is not None and other._key is not None:
+            key = self._key + [x for x in other._key if x not in self._key]
+        left, right = _align_categories(self, other, col_list)
+        res = _grace_join(left, right, col_list, algorithm, other._indexes)
+        if res is None:
+            lpos, rpos = _join_positions(left, right, col_list, algorithm, other._indexes)
+            res = _join_frame(left, right, col_list, lpos, rpos)
+        return _relation(res, key)
+
+
+
+    @_operator
+    def union(self,other):
+        """ Take two Relations with the same columns and put them together top to bottom
+
+        Rows that appear more than once, in either relation, are only kept the first time.
+
+        :param other:
+        :return:
+
+        :Example:
+
+        >>> from reframe import Relation
+        >>> country = Relation('country.csv')
+        >>> country.query('region == "Western Africa"').union(country.query('region == "Polynesia"')).project(['name','region'])
+                          name          region
+        22               Benin  Western Africa
+        33        Burkina Faso  Western Africa
+        54              Gambia  Western Africa
+        56               Ghana  Western Africa
+        63              Guinea  Western Africa
+        64       Guinea-Bissau  Western Africa
+        89          Cape Verde  Western Africa
+        112            Liberia  Western Africa
+        124               Mali  Western Africa
+        129         Mauritania  Western Africa
+        144              Niger  Western Africa
+        145            Nigeria  Western Africa
+        149      Côte d'Ivoire  Western Africa
+        171       Saint Helena  Western Africa
+        183            Senegal  Western Africa
+        185       Sierra Leone  Western Africa
+        202               Togo  Western Africa
+        5       American Samoa       Polynesia
+        37        Cook Islands       Polynesia
+        146               Niue       Polynesia
+        157           Pitcairn       Polynesia
+        166   French Polynesia       Polynesia
+        179              Samoa       Polynesia
+        203            Tokelau       Polynesia
+        204              Tonga       Polynesia
+        212             Tuvalu       Polynesia
+        221  Wallis and Futuna       Polynesia
+        >>>
+        """
+        if sorted(self.columns) != sorted(other.columns):
+            raise ValueError("Relations must be Union compatible")
+        cols = list(self.columns)
+        left, right = _align_categories(self, other[cols], cols)
+        codes, ncodes = _row_codes(left, right, cols)
+        both = pd.concat([left, right])
+        return _relation(both[_first_rows(codes, ncodes)], cols)
+
+    @_operator
+    def minus(self,other):
+        """return a relation containing the rows in self 'but not' in other
+
+        The relations must be union compatible.  A row is removed when every one of its attributes,
+        including missing values, matches a row of other.  The result is distinct.
+
+        :param other:
+        :return:
+
+        :Example:
+
+        >>> from reframe import Relation
+        >>> country = Relation('country.csv')
+        >>> country.query('continent == "Africa"').minus(country.query('region == "Western Africa"')).project(['name','region','continent'])
+                                              name           region continent
+        4                                  Algeria  Northern Africa    Africa
+        7                                   Angola   Central Africa    Africa
+        27                                Botswana  Southern Africa    Africa
+        34                                 Burundi   Eastern Africa    Africa
+        39                                Djibouti   Eastern Africa    Africa
+        43                                   Egypt  Northern Africa    Africa
+        45                                 Eritrea   Eastern Africa    Africa
+        47                            South Africa  Southern Africa    Africa
+        48                                Ethiopia   Eastern Africa    Africa
+        53                                   Gabon   Central Africa    Africa
+        87                                Cameroon   Central Africa    Africa
+        91                                   Kenya   Eastern Africa    Africa
+        92                Central African Republic   Central Africa    Africa
+        97                                 Comoros   Eastern Africa    Africa
+        98                                   Congo   Central Africa    Africa
+        99   Congo, The Democratic Republic of the   Central Africa    Africa
+        110                                Lesotho  Southern Africa    Africa
+        113                 Libyan Arab Jamahiriya  Northern Africa    Africa
+        117                         Western Sahara  Northern Africa    Africa
+        119                             Madagascar   Eastern Africa    Africa
+        121                                 Malawi   Eastern Africa    Africa
+        126                                Morocco  Northern Africa    Africa
+        130                              Mauritius   Eastern Africa    Africa
+        131                                Mayotte   Eastern Africa    Africa
+        138                             Mozambique   Eastern Africa    Africa
+        140                                Namibia  Southern Africa    Africa
+        162                      Equatorial Guinea   Central Africa    Africa
+        167                                Réunion   Eastern Africa    Africa
+        169                                 Rwanda   Eastern Africa    Africa
+        178                                 Zambia   Eastern Africa    Africa
+        181                  Sao Tome and Principe   Central Africa    Africa
+        184                             Seychelles   Eastern Africa    Africa
+        189                                Somalia   Eastern Africa    Africa
+        191                                  Sudan  Northern Africa    Africa
+        194                              Swaziland  Southern Africa    Africa
+        199                               Tanzania   Eastern Africa    Africa
+        206                                   Chad   Central Africa    Africa
+        208                                Tunisia  Northern Africa    Africa
+        213                                 Uganda   Eastern Africa    Africa
+        230                               Zimbabwe   Eastern Africa    Africa
+        234         British Indian Ocean Territory   Eastern Africa    Africa
+        """
+        if sorted(self.columns) != sorted(other.columns):
+            raise ValueError("Relations must be Union compatible")
+        cols = list(self.columns)
+        left, right = _align_categories(self, other[cols], cols)
+        codes, ncodes = _row_codes(left, right, cols)
+        lcodes = codes[:len(left)]
+        keep = ~_has_code(lcodes, codes[len(left):], ncodes)
+        if self._key is None:
+            keep &= _first_rows(lcodes, ncodes)
+        return _relation(self[keep], self._key or cols)
+
+
+    @_operator
+    def rename(self,old,new):
+        """Rename old attribute to new
+
+        :param old: string, name of old attribute
+        :param new: string, name to change old to
+        :return: Relation
+
+        :Example:
+
+        >>> from reframe import Relation
+        >>> country = Relation('country.csv')
+        >>> country.project(['name']).rename('name','countryname').head()
+                    countryname
+        0           Afghanistan
+        1           Netherlands
+        2  Netherlands Antilles
+        3               Albania
+        4               Algeria
+        >>>
+        """
+        res = super().rename(columns={old:new})
+        indexes = {new if c == old else c: i for c, i in (self._indexes or {}).items()}
+        if self._key is not None:
+            return _relation(res, [new if x == old else x for x in self._key], indexes)
+        distinct = _distinct(res)
+        return _relation(distinct, list(res.columns), indexes if distinct is res else None)
+
+    @_operator
+    def cartesian_product(self, other, where=None, chunksize=None):
+        """Pair every row of this relation with every row of other
+
+        Attributes that appear in both relations are renamed with a ``_x`` and ``_y`` suffix.  Neither
+        input is modified.  When a ``where`` condition is given the product is built in chunks of
+        about ``chunksize`` rows and each chunk is filtered as soon as it is built, so the full product
+        is never held in memory.  This is the same as calling ``query(where)`` on the product.
+
+        :param other: The relation to pair with
+        :param where: an optional query string to select rows of the product
+        :param chunksize: the number of rows of the product to build at a time
+        :return: a Relation
+
+        :Example:
+
+        >>> from reframe import Relation
+        >>> country = Relation('country.csv')
+        >>> antarctica = country.query('continent == "Antarctica"').project(['code'])
+        >>> antarctica.cartesian_product(antarctica.rename('code', 'other'), where='code < other')
+           code other
+        1   ATA   BVT
+        2   ATA   SGS
+        3   ATA   HMD
+        4   ATA   ATF
+        7   BVT   SGS
+        8   BVT   HMD
+        17  HMD   SGS
+        21  ATF   BVT
+        22  ATF   SGS
+        23  ATF   HMD
+        >>> import pandas as pd
+        >>> Relation(pd.DataFrame({'a': [1, 1, 2]})).cartesian_product(Relation(pd.DataFrame({'b': ['x', 'y']})))
+           a  b
+        0  1  x
+        1  1  y
+        2  2  x
+        3  2  y
+        >>> len(country.query('continent == "Nowhere"').project(['code']).cartesian_product(country.project(['name'])))
+        0
+        >>>
+        """
+        if chunksize is None and where is not None:
+            chunksize = PRODUCT_CHUNKSIZE
+        chunks = list(self.cartesian_chunks(other, where, chunksize))
+        res = chunks[0] if len(chunks) == 1 else pd.concat(chunks)
+        return _relation(res, chunks[0]._key)
+
+    def cartesian_chunks(self, other, where=None, chunksize=PRODUCT_CHUNKSIZE):
+        """Generate the cartesian product with other as a sequence of smaller Relations
+
+        Each chunk pairs a slice of the rows of this relation with every row of other, and holds
+        about ``chunksize`` rows before the ``where`` condition is applied.  Rows are labelled by their
+        position in the whole product, so concatenating the chunks gives ``cartesian_product``.
+
+        :param other: The relation to pair with
+        :param where: an optional query string to select rows of each chunk
+        :param chunksize: the number of rows of the product to build at a time, or None for one chunk
+        :return: a generator of Relations
+        """
+        # the product of two distinct relations is distinct, so drop duplicates from the inputs
+        # rather than from the much larger product
+        if not isinstance(other, Relation):
+            other = Relation(other)
+        left = self if self._key is not None else _relation(_distinct(self), list(self.columns))
+        right = other if other._key is not None else _relation(_distinct(other), list(other.columns))
+        shared = [c for c in left.columns if c in right.columns]
+        key = [c + '_x' if c in shared else c for c in (left._key or left.columns)]
+        key += [c + '_y' if c in shared else c for c in (right._key or right.columns)]
+        step = max(len(left), 1) if chunksize is None else max(1, chunksize // max(len(right), 1))
+        for start in range(0, max(len(left), 1), step):
+            res = pd.merge(pd.DataFrame(left.iloc[start:start + step]), pd.DataFrame(right), how='cross')
+            res.index = pd.RangeIndex(start * len(right), start * len(right) + len(res))
+            if where is not None:
+                res = _select(res, where)
+            yield _relation(res, key)
+
+    def groupby(self,cols):
+        """ Collapse a relation containing one row per unique value in the given group by attributes.
+
+        The groupby operator is always used in conjunction with an aggregate operator.
+
+        * count
+        * sum
+        * mean
+        * median
+        * min
+        * max
+        * agg, to compute several of the above in one pass
+
+        :param cols: A list of columns to group on
+        :return: A GroupWrap object for one of the aggregate operators to work on.
+
+
+        :Example:
+
+        How many countries are in each continent?
+
+        >>> from reframe import Relation
+        >>> country = Relation('country.csv')
+        >>> country.groupby(['continent']).count('name')
+               continent  count_name
+        0         Africa          58
+        1     Antarctica           5
+        2           Asia          51
+        3         Europe          46
+        4  North America          37
+        5        Oceania          28
+        6  South America          14
+
+
+        """
+        res = super().groupby(cols, observed=True)
+        return GroupWrap(res,cols)
+
+    def extend(self,newcol,series):
+        """Create a new attribute by combining or modifying one or more existing attributes
+
+        :param newcol:  Name of the new column to create
+        :param series:  An expression involving one or more other attributes
+        :return:
+
+        :Example:
+
+        >>> from reframe import Relation
+        >>> country = Relation('country.csv')
+        >>> country.extend('gnpdiff',country.gnp - country.gnpold).project(['name','gnpdiff']).head(10)
+                           name  gnpdiff
+        0           Afghanistan      NaN
+        1           Netherlands    10884
+        2  Netherlands Antilles      NaN
+        3               Albania      705
+        4               Algeria     3016
+        5        American Samoa      NaN
+        6               Andorra      NaN
+        7                Angola    -1336
+        8              Anguilla      NaN
+        9   Antigua and Barbuda       28
+        >>>
+
+        """
+        if newcol in self.columns:
+            # the index and the key of the values being replaced no longer hold for the new ones
+            if self._indexes and newcol in self._indexes:
+                self._indexes = {c: i for c, i in self._indexes.items() if c != newcol} or None
+            if self._key is not None and newcol in self._key:
+                self._key = None
+        self[newcol] = series
+        return self
+
+    def create_index(self, col, kind='hash'):
+        """Build an index on an attribute so that query can find matching rows without a scan
+
+        A ``'hash'`` index answers ``==`` and ``in`` comparisons with literal values, a ``'sorted'``
+        index answers ``<``, ``<=``, ``>`` and ``>=`` as well.  ``query`` uses the index for the parts of
+        the condition it can answer and only checks the rest on the rows it found.  The index is kept
+        by ``sort``, by ``rename`` and by ``project`` when it keeps the attribute and drops no rows, and dropped by
+        ``extend`` when it replaces the attribute.
+
+        :param col: the attribute to index
+        :param kind: ``'hash'`` or ``'sorted'``
+        :return: the Relation, so that calls can be chained
+
+        :Example:
+
+        >>> from reframe import Relation
+        >>> country = Relation('country.csv').create_index('code').create_index('indepyear', kind='sorted')
+        >>> country.query('code in ["NLD", "BEL"]').project(['code','name'])
+           code         name
+        1   NLD  Netherlands
+        20  BEL      Belgium
+        >>> country.query('1000 < indepyear < 1200').project(['name','indepyear'])
+                       name  indepyear
+        29   United Kingdom     1066.0
+        159        Portugal     1143.0
+        >>> len(country.create_index('population', kind='sorted').query('population == 0.5'))
+        0
+        >>> country.extend('code', country.code.str.lower()).query('code == "nld"').project(['name'])
+                  name
+        1  Netherlands
+        >>>
+        """
+        if col not in self.columns:
+            raise ValueError("'{}' is not a valid attribute name in relation".format(col))
+        if kind not in ('hash', 'sorted'):
+            raise ValueError("kind must be 'hash' or 'sorted'")
+        index = _HashIndex(self[col]) if kind == 'hash' else _SortedIndex(self[col])
+        self._indexes = dict(self._indexes or {}, **{col: index})
+        return self
+
+    @staticmethod
+    def njoin_all(relations, algorithm='auto'):
+        """Create the natural join of a list of relations, choosing the order to join them in
+
+        The order in which relations are joined does not change the result, but it does change the
+        size of the results in between, which can be far larger than the final one.  njoin_all
+        estimates those sizes from the statistics of the relations, see analyze, and joins them in
+        the order that keeps them smallest.  Every order is considered for up to 10 relations, and
+        for more the next relation is picked greedily.  The attributes of the result are in the order
+        they first appear in the list.
+
+        :param relations: a list of Relations, each with an attribute in common with another one
+        :param algorithm: the algorithm for every join, see njoin
+        :return: a Relation
+
+        :Example:
+
+        >>> from reframe import Relation
+        >>> country = Relation('country.csv')
+        >>> Relation.njoin_all([country.project(['continent', 'region']), country.project(['code', 'name', 'continent']), country.query('population > 150000000').project(['code'])])
+                continent                     region code           name
+        0   South America              South America  BRA         Brazil
+        1            Asia  Southern and Central Asia  IDN      Indonesia
+        2            Asia                Middle East  IDN      Indonesia
+        3            Asia             Southeast Asia  IDN      Indonesia
+        4            Asia               Eastern Asia  IDN      Indonesia
+        5            Asia  Southern and Central Asia  IND          India
+        6            Asia                Middle East  IND          India
+        7            Asia             Southeast Asia  IND          India
+        8            Asia               Eastern Asia  IND          India
+        9            Asia  Southern and Central Asia  CHN          China
+        10           Asia                Middle East  CHN          China
+        11           Asia             Southeast Asia  CHN          China
+        12           Asia               Eastern Asia  CHN          China
+        13           Asia  Southern and Central Asia  PAK       Pakistan
+        14           Asia                Middle East  PAK       Pakistan
+        15           Asia             Southeast Asia  PAK       Pakistan
+        16           Asia               Eastern Asia  PAK       Pakistan
+        17  North America                  Caribbean  USA  United States
+        18  North America            Central America  USA  United States
+        19  North America              North America  USA  United States
+        >>>
+        """
+        relations = [r if isinstance(r, Relation) else Relation(r) for r in relations]
+        if not relations:
+            raise ValueError("njoin_all needs at least one relation")
+        order = _join_order(relations)
+        res = relations[order[0]]
+        for i in order[1:]:
+            res = res.njoin(relations[i], algorithm=algorithm)
+        cols = list(dict.fromkeys(c for r in relations for c in r.columns))
+        return _relation(pd.DataFrame(res)[cols], res._key)
+
+    @staticmethod
+    def prepare(q):
+        """Compile a query string once, to run it many times with different values
+
+        Values are given to the ``@`` parameters of q when the prepared query is called with a
+        relation.  They are never written into a query string, so a value such as
+        ``'Asia" or name != "'`` is compared as it is instead of changing the query.  Prepared
+        queries are kept, so preparing the same string again does not parse it again.
+
+        Comparisons, ``and``, ``or``, ``not``, ``in`` and arithmetic are supported.
+
+        :param q: a query string with ``@`` parameters
+        :return: a PreparedQuery
+
+        :Example:
+
+        >>> from reframe import Relation
+        >>> country = Relation('country.csv')
+        >>> big = Relation.prepare('continent == @c and population > @p')
+        >>> big(country, c='Europe', p=80000000).project(['name','population'])
+                           name  population
+        176             Germany    82164700
+        225  Russian Federation   146934000
+        >>> len(big(country, c='Asia" or name != "', p=0))
+        0
+        >>>
+        """
+        return _prepare(q)
+
+    def analyze(self, bins=_HISTOGRAM_BINS):
+        """Compute and keep statistics of every attribute, for estimating the size of results
+
+        For every attribute the number of distinct values, the fraction of missing values, the
+        smallest and largest values and the most common values are counted, and numeric attributes
+        get an equi-depth histogram: the boundaries of ``bins`` ranges that each hold the same number
+        of rows.  ``estimate_query``, ``estimate_njoin`` and ``njoin_all`` use them, and compute the
+        statistics of the attributes they need themselves when the relation has none or has changed
+        since it was analyzed.
+
+        :param bins: the number of ranges in the histograms
+        :return: a Relation with a row of statistics for every attribute
+
+        :Example:
+
+        >>> from reframe import Relation
+        >>> country = Relation('country.csv')
+        >>> country.project(['name', 'continent', 'population', 'lifeexpectancy']).analyze()
+                attribute  distinct  null_frac          min            max
+        0            name       239     0.0000  Afghanistan       Zimbabwe
+        1       continent         7     0.0000       Africa  South America
+        2      population       226     0.0000            0     1277558000
+        3  lifeexpectancy       160     0.0711         37.2           83.5
+        >>>
+        """
+        stats = {col: _ColumnStats(self[col], bins) for col in self.columns}
+        self._stats = (_frame_state(self), stats)
+        res = pd.DataFrame({'attribute': list(stats),
+                            'distinct': [c.distinct for c in stats.values()],
+                            'null_frac': [round(c.nulls, 4) for c in stats.values()],
+                            'min': [c.min for c in stats.values()],
+                            'max': [c.max for c in stats.values()]})
+        return _relation(res, ['attribute'])
+
+    def _statistics(self, cols=None):
+        """return the statistics of the attributes, computing those of cols that are missing or stale"""
+        state = _frame_state(self)
+        if self._stats is None or not _same_state(self._stats[0], state):
+            self._stats = (state, {})
+        stats = self._stats[1]
+        for col in self.columns if cols is None else cols:
+            if col not in stats:
+                stats[col] = _ColumnStats(self[col], _HISTOGRAM_BINS)
+        return stats
+
+    def estimate_query(self, q):
+        """Estimate the number of rows query(q) returns, without running the query
+
+        The estimate assumes the conditions of q are independent of each other.  Conditions the
+        statistics cannot judge, such as comparisons of two attributes, are assumed to select a third
+        of the rows.
+
+        :param q: a query string
+        :return: the estimated number of rows
+
+        :Example:
+
+        >>> from reframe import Relation
+        >>> country = Relation('country.csv')
+        >>> country.estimate_query('continent == "Europe" and population > 10000000')
+        15
+        >>> len(country.query('continent == "Europe" and population > 10000000'))
+        16
+        >>>
+        """
+        try:
+            pred = _Predicate(q)
+        except SyntaxError:
+            return int(round(len(self) * _DEFAULT_SELECTIVITY))
+        stats = self._statistics([c for c in pred.names() if c in self.columns])
+        return int(round(len(self) * _selectivity(stats, pred, pred.tree)))
+
+    def estimate_njoin(self, other):
+        """Estimate the number of rows njoin(other) returns, without running the join
+
+        :param other: the relation to join with
+        :return: the estimated number of rows
+
+        :Example:
+
+        >>> from reframe import Relation
+        >>> country = Relation('country.csv')
+        >>> country.project(['code', 'continent']).estimate_njoin(country.project(['continent', 'region']))
+        1040
+        >>> len(country.project(['code', 'continent']).njoin(country.project(['continent', 'region'])))
+        1040
+        >>>
+        """
+        col_list = [x for x in self.columns if x in other.columns]
+        if not col_list:
+            raise ValueError("The two relations must have some columns in common")
+        if not isinstance(other, Relation):
+            other = Relation(other)
+        stats, other_stats = self._statistics(col_list), other._statistics(col_list)
+        fraction = np.prod([stats[col].join(other_stats[col]) for col in col_list])
+        return int(round(len(self) * len(other) * fraction))
+
+    @staticmethod
+    def scan(filepath, sep='|', chunksize=SCAN_CHUNKSIZE):
+        """Create a LazyRelation that streams a csv file instead of loading it all at once
+
+        The file is read ``chunksize`` rows at a time when the plan runs.  The optimizer moves
+        ``project`` and ``query`` operators into the reader, so only the columns that are used are
+        parsed and each chunk is filtered before the chunks are combined.  Use this for files that are
+        too large to load when the rows you need are not.
+
+        :param filepath: a string specifying a path to a csv file
+        :param sep: specify a separator for the data file.  default is ``|``
+        :param chunksize: the number of rows to read at a time
+        :return: a LazyRelation
+
+        :Example:
+
+        >>> from reframe import Relation
+        >>> Relation.scan('country.csv').query('continent == "Antarctica"').project(['code','name']).collect()
+            code                                          name
+        232  ATA                                    Antarctica
+        233  BVT                                 Bouvet Island
+        235  SGS  South Georgia and the South Sandwich Islands
+        236  HMD             Heard Island and McDonald Islands
+        237  ATF                   French Southern territories
+        >>>
+        """
+        columns = list(pd.read_csv(filepath, sep=sep, nrows=0).columns)
+        return LazyRelation(_PlanNode('csv', filepath=filepath, sep=sep, chunksize=chunksize,
+                                      columns=columns, usecols=None, where=None))
+
+    @staticmethod
+    def open(filepath, sep='|'):
+        """Create a LazyRelation that loads the columns of a large csv file as they are needed
+
+        The first time a file is opened the position of every row and field in it is found and saved
+        next to the file in ``filepath.offsets.npz``, later opens just load these offsets.  The file is
+        memory mapped, and a column is only parsed when a plan first uses it, so
+        ``project(['name','region'])`` never parses the other attributes.  When a selection is
+        moved into the file by the optimizer, only its attributes are parsed for every row, the
+        rest just for the rows that match.  Columns parsed for every row are kept for later plans.
+        pandas infers the dtype of a column from all of its values, so a column is parsed for every
+        row the first time it is used, and its dtype is saved with the offsets; after that the rows
+        that match a selection get the same dtypes as Relation(filepath) gives.
+
+        Fields are split on sep and newlines only, so files with double quotes are refused with a
+        ValueError; read those with Relation(filepath).  Blank lines, LF or CRLF, are skipped, as they
+        are by Relation(filepath).
+
+        :param filepath: a string specifying a path to a csv file
+        :param sep: specify a separator for the data file.  default is ``|``
+        :return: a LazyRelation
+
+        :Example:
+
+        >>> from reframe import Relation
+        >>> Relation.open('country.csv').query('continent == "Antarctica"').project(['code','name']).collect()
+            code                                          name
+        232  ATA                                    Antarctica
+        233  BVT                                 Bouvet Island
+        235  SGS  South Georgia and the South Sandwich Islands
+        236  HMD             Heard Island and McDonald Islands
+        237  ATF                   French Southern territories
+        >>> import os, tempfile
+        >>> path = os.path.join(tempfile.mkdtemp(), 'pairs.csv')
+        >>> with open(path, 'w') as f:
+        ...     _ = f.write('a|b\\n1|x\\n\\n2|y\\n\\n')
+        >>> Relation.open(path).collect()
+           a  b
+        0  1  x
+        1  2  y
+        >>> with open(path, 'w') as f:
+        ...     _ = f.write('a|b\\n1|x\\n\\n2\\n')
+        >>> Relation.open(path).collect()  # doctest: +ELLIPSIS
+        Traceback (most recent call last):
+        ...
+        ValueError: line 4 of ... does not have 2 fields
+        >>>
+        """
+        source = _ColumnFile(filepath, sep)
+        return LazyRelation(_PlanNode('file', source=source, columns=source.columns, usecols=None, where=None))
+
+    def to_sqlite(self, database, table, indexes=()):
+        """Store the relation as a table in a SQLite database, replacing any table of that name
+
+        :param database: the path of the database file, it is created if it does not exist
+        :param table: the name of the table
+        :param indexes: a list of attributes to create SQLite indexes on
+        """
+        connection = sqlite3.connect(database)
+        try:
+            pd.DataFrame(self).to_sql(table, connection, if_exists='replace', index=False)
+            for col in indexes:
+                connection.execute('CREATE INDEX {} ON {} ({})'.format(
+                    _sql_name('{}_{}'.format(table, col)), _sql_name(table), _sql_name(col)))
+            connection.commit()
+        finally:
+            connection.close()
+
+    @staticmethod
+    def sqlite(database, table):
+        """Create a LazyRelation backed by a table of a SQLite database
+
+        The parts of the plan that only use tables of the database, and the operators project, query,
+        rename, njoin, union, intersect, minus and the groupby aggregates, are translated into one SQL
+        statement that SQLite runs with its own indexes, on disk where it needs to.  Only the final
+        result is loaded into a Relation.  Anything else, such as a sort, a median, a query using
+        ``@`` variables or a join with a relation in memory, runs in pandas on the rows SQLite returns.
+        So do queries SQLite would answer differently: those that divide, which gives NULL instead of
+        inf for a division by zero, and those that compare numbers with text, which SQLite converts.
+
+        The results have the same rows as the pandas engine, although SQLite returns them in an order
+        of its own, the row labels are 0, 1, 2, ... and floats it adds up may differ in the last digit.
+
+        :param database: the path of the database file
+        :param table: the name of the table
+        :return: a LazyRelation
+
+        :Example:
+
+        >>> import os, tempfile
+        >>> from reframe import Relation
+        >>> country = Relation('country.csv')
+        >>> database = os.path.join(tempfile.mkdtemp(), 'world.db')
+        >>> country.to_sqlite(database, 'country', indexes=['continent'])
+        >>> world = Relation.sqlite(database, 'country')
+        >>> world.query('continent == "Antarctica"').project(['code','name']).sort('code').collect()
+          code                                          name
+        0  ATA                                    Antarctica
+        4  ATF                   French Southern territories
+        1  BVT                                 Bouvet Island
+        3  HMD             Heard Island and McDonald Islands
+        2  SGS  South Georgia and the South Sandwich Islands
+        >>>
+        """
+        connection = sqlite3.connect(database)
+        try:
+            info = connection.execute('PRAGMA table_info({})'.format(_sql_name(table))).fetchall()
+        finally:
+            connection.close()
+        columns = [row[1] for row in info]
+        if not columns:
+            raise ValueError("{} has no table {}".format(database, table))
+        return LazyRelation(_PlanNode('sqlite', database=database, table=table, columns=columns,
+                                      types={row[1]: row[2] for row in info}))
+
+    def lazy(self):
+        """Return a LazyRelation that records operators instead of running them
+
+        Each operator called on a LazyRelation adds a node to a relational algebra plan.  Nothing is
+        computed until the result is needed by ``collect()``, ``head()`` or printing the relation, so a
+        long chain of operators does not create a full copy of the data at every step.
+
+        :return: a LazyRelation
+
+        :Example:
+
+        >>> from reframe import Relation
+        >>> country = Relation('country.csv')
+        >>> country.lazy().query('continent == "Antarctica"').project(['code','name']).collect()
+            code                                          name
+        232  ATA                                    Antarctica
+        233  BVT                                 Bouvet Island
+        235  SGS  South Georgia and the South Sandwich Islands
+        236  HMD             Heard Island and McDonald Islands
+        237  ATF                   French Southern territories
+        >>>
+        """
+        return LazyRelation(_PlanNode('relation', relation=self))
+
+
+def _relation(frame, key=None, indexes=None):
+    """wrap the result of an operator in a Relation that records its key -- invisible to end user"""
+    res = Relation(frame)
+    res._key = key
+    res._indexes = indexes or None
+    return res
+
+
+class GroupWrap(pd.core.groupby.DataFrameGroupBy):
+    """Wrapper for a DataFrameGroupBy object -- invisible to end user
+    """
+    def __init__(self, gbo, cols):
+        self.gbo = gbo
+        self.gb_cols = cols
+
+    def key_cols(self):
+        """return the group by attributes as a list, they are the key of every aggregate result"""
+        if type(self.gb_cols) == list:
+            return list(self.gb_cols)
+        return [self.gb_cols]
+
+    @_operator
+    def aggregate(self, func, col):
+        """apply the aggregate function named func to a single column of each group
+
+        Only the group by attributes and col take part in the aggregation, and since there is one
+        row per group the result never needs duplicates dropped.
+
+        :param func: the name of a pandas aggregate, for example ``'sum'``
+        :param col: the column to aggregate
+        :return: A Relation with the groupby column(s) and a column named func_col
+        """
+        if self._spills([col]):
+            return self._spilled_agg({func + "_" + col: (col, func)})
+        if _parallel(len(self.gbo.obj)):
+            return self._parallel_agg({func + "_" + col: (col, func)})
+        res = getattr(self.gbo[col], func)()
+        res.name = func + "_" + col
+        return _relation(res.reset_index(), self.key_cols())
+
+    @_operator
+    def agg(self, **aggs):
+        """
+        Compute several aggregates for each group in a single pass over the data.
+
+        Each keyword names one of the aggregate operators and gives the column, or a list of columns,
+        to apply it to.  The groups are only found once, and the result has one column per aggregate,
+        named the same way as the single aggregate operators name it.
+
+        :param aggs: keywords from count, sum, mean, median, min and max
+        :return:  A Relation with the groupby column(s) and one column for every aggregate
+
+        :Example:
+
+        >>> from reframe import Relation
+        >>> country = Relation('country.csv')
+        >>> country.groupby(['continent']).agg(count='name', max=['population','gnp'])
+               continent  count_name  max_population    max_gnp
+        0         Africa          58       111506000   116729.0
+        1     Antarctica           5               0        0.0
+        2           Asia          51      1277558000  3787042.0
+        3         Europe          46       146934000  2133367.0
+        4  North America          37       278357000  8510700.0
+        5        Oceania          28        18886000   351182.0
+        6  South America          14       170115000   776739.0
+        >>>
+
+        """
+        for func in aggs:
+            if func not in ('count', 'sum', 'mean', 'median', 'min', 'max'):
+                raise ValueError("'{}' is not an aggregate operator".format(func))
+        spec = {name: (col, func) for name, col, func in _aggregates(aggs)}
+        if self._spills([col for col, func in spec.values()]):
+            return self._spilled_agg(spec)
+        if _parallel(len(self.gbo.obj)):
+            return self._parallel_agg(spec)
+        res = self.gbo.agg(**spec)
+        return _relation(res.reset_index(), self.key_cols())
+
+    def _spills(self, cols):
+        """return True when aggregating cols needs more than the memory limit, see set_memory_limit"""
+        if _memory_limit is None:
+            return False
+        frame = pd.DataFrame(self.gbo.obj)
+        used = list(dict.fromkeys(self.key_cols() + cols))
+        # the group codes, the order of the rows by group and the aggregated values
+        return len(frame) * (24 + _row_bytes(frame[used])) > _memory_limit
+
+    def _spilled_agg(self, spec):
+        """compute the named aggregates in spec one hash partition of the groups at a time"""
+        cols = self.key_cols()
+        frame = pd.DataFrame(self.gbo.obj)[list(dict.fromkeys(cols + [col for col, func in spec.values()]))]
+        needed = len(frame) * (24 + _row_bytes(frame))
+        parts = int(min(max(-(-needed // max(_memory_limit // 2, _SPILL_MIN_BYTES)), 1), 2 ** 16 - 1))
+        hashes = pd.util.hash_pandas_object(frame[cols], index=False).to_numpy()
+        with tempfile.TemporaryDirectory(dir=_spill_dir) as directory:
+            paths = []
+            for rows in _hash_partition(hashes, parts):
+                if len(rows):
+                    paths.append(os.path.join(directory, '{}.pkl'.format(len(paths))))
+                    _group_agg(frame.take(rows), cols, spec).to_pickle(paths[-1])
+            res = pd.concat([pd.read_pickle(path) for path in paths]).sort_index()
+        return _relation(res.reset_index(), cols)
+
+    def _parallel_agg(self, spec):
+        """compute the named aggregates in spec with the workers, see set_parallel"""
+        frame, cols = pd.DataFrame(self.gbo.obj), self.key_cols()
+        sample = frame[cols].iloc[:10000]
+        if (any(func == 'median' or (func in ('sum', 'mean') and pd.api.types.is_float_dtype(frame[col]))
+                for col, func in spec.values()) or len(sample.drop_duplicates()) * 10 > len(sample)):
+            # a median cannot be combined from parts, float sums added up in parts round differently,
+            # and with many groups the partial aggregates are nearly as large as the relation, so
+            # every worker gets whole groups instead
+            hashes = pd.util.hash_pandas_object(frame[cols], index=False).to_numpy()
+            parts = _map(_group_agg, [(frame.take(rows), cols, spec) for rows in _hash_partition(hashes, _workers)])
+            res = pd.concat(parts).sort_index()
+        else:
+            # every worker aggregates a slice of the rows, then the partial aggregates are combined
+            partial, combine = {}, {}
+            for name, (col, func) in spec.items():
+                for part in (('sum', 'count') if func == 'mean' else (func,)):
+                    partial[name + '\0' + part] = (col, part)
+                    combine[name + '\0' + part] = (name + '\0' + part, 'sum' if part == 'count' else part)
+            step = -(-len(frame) // _workers)
+            parts = _map(_group_agg, [(frame.iloc[i:i + step], cols, partial) for i in range(0, len(frame), step)])
+            combined = _group_agg(pd.concat(parts).reset_index(), cols, combine)
+            res = pd.DataFrame(index=combined.index)
+            for name, (col, func) in spec.items():
+                if func == 'mean':
+                    res[name] = combined[name + '\0sum'] / combined[name + '\0count']
+                else:
+                    res[name] = combined[name + '\0' + func]
+        return _relation(res.reset_index(), cols)
+
+    def count(self, col):
+        """
+        Count the number of occurrences of a value in the column for a group.
+
+        :param col:
+        :return:  A Relation with the groupby column(s) and count for a single column
+
+        :Example:
+
+        >>> from reframe import Relation
+        >>> country = Relation('country.csv')
+        >>> country.groupby(['continent']).count('name')
+               continent  count_name
+        0         Africa          58
+        1     Antarctica           5
+        2           Asia          51
+        3         Europe          46
+        4  North America          37
+        5        Oceania          28
+        6  South America          14
+        >>>
+
+        """
+        return self.aggregate('count', col)
+
+
+    def mean(self, col):
+        """
+        Count the number of occurrences of a value in the column for a group.
+
+        :param col:
+        :return:  A Relation with the groupby column(s) and count for a single column
+
+        :Example:
+
+        >>> from reframe import Relation
+        >>> country = Relation('country.csv')
+        >>> country.groupby(['continent']).mean('gnp')
+               continent       mean_gnp
+        0         Africa   10006.465517
+        1     Antarctica       0.000000
+        2           Asia  150105.725490
+        3         Europe  206497.065217
+        4  North America  261854.789189
+        5        Oceania   14991.953571
+        6  South America  107991.000000
+
+        >>>
+
+        """
+        return self.aggregate('mean', col)
+
+    def min(self, col):
+        """
+        Count the number of occurrences of a value in the column for a group.
+
+        :param col:
+        :return:  A Relation with the groupby column(s) and count for a single column
+
+        :Example:
+
+        >>> from reframe import Relation
+        >>> country = Relation('country.csv')
+        >>> country.groupby(['continent']).min('lifeexpectancy')
+               continent  min_lifeexpectancy
+        0         Africa                37.2
+        1     Antarctica                 NaN
+        2           Asia                45.9
+        3         Europe                64.5
+        4  North America                49.2
+        5        Oceania                59.8
+        6  South America                62.9
+
+        >>>
+
+        """
+        return self.aggregate('min', col)
+
+    def max(self, col):
+        """
+        Count the number of occurrences of a value in the column for a group.
+
+        :param col:
+        :return:  A Relation with the groupby column(s) and count for a single column
+
+        :Example:
+
+        >>> from reframe import Relation
+        >>> country = Relation('country.csv')
+        >>> country.groupby(['continent']).max('gnp')
+               continent  max_gnp
+        0         Africa   116729
+        1     Antarctica        0
+        2           Asia  3787042
+        3         Europe  2133367
+        4  North America  8510700
+        5        Oceania   351182
+        6  South America   776739
+        >>>
+
+        """
+        return self.aggregate('max', col)
+
+    def sum(self, col):
+        """
+        Count the number of occurrences of a value in the column for a group.
+
+        :param col:
+        :return:  A Relation with the groupby column(s) and count for a single column
+
+        :Example:
+
+        >>> from reframe import Relation
+        >>> country = Relation('country.csv')
+        >>> country.groupby(['continent']).sum('surfacearea')
+               continent  sum_surfacearea
+        0         Africa       30250377.0
+        1     Antarctica       13132101.0
+        2           Asia       31881008.0
+        3         Europe       23049133.9
+        4  North America       24214469.0
+        5        Oceania        8564294.0
+        6  South America       17864922.0
+        >>>
+
+        """
+        return self.aggregate('sum', col)
+
+    def median(self, col):
+        """
+        Count the number of occurrences of a value in the column for a group.
+
+        :param col:
+        :return:  A Relation with the groupby column(s) and count for a single column
+
+        :Example:
+
+        >>> from reframe import Relation
+        >>> country = Relation('country.csv')
+        >>> country.groupby(['continent']).median('gnp')
+               continent  median_gnp
+        0         Africa      2533.5
+        1     Antarctica         0.0
+        2           Asia     15706.0
+        3         Europe     20401.0
+        4  North America      2223.0
+        5        Oceania       123.0
+        6  South America     20300.5
+        >>>
+
+        """
+        return self.aggregate('median', col)
+
+def _group_agg(frame, cols, spec):
+    """return the named aggregates spec of the groups of frame, indexed by the group by attributes"""
+    return frame.groupby(cols, observed=True).agg(**spec)
+
+# string literals are matched first so that @, & and | inside them are left alone
+_QUERY_TOKENS = re.compile(r"""("(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')|(`[^`]*`)|@([A-Za-z_]\w*)|(&)|(\|)""")
+_LOCAL_PREFIX = '__reframe_local_'
+
+class _Predicate:
+    """A query string parsed into a Python expression tree -- invisible to end user
+
+    Query strings use the pandas syntax, so backtick quoted names and ``@`` local variables are
+    replaced by plain identifiers, and ``&`` / ``|`` by ``and`` / ``or`` (pandas gives them the same
+    precedence), before the string is parsed with the ast module.
+    """
+    def __init__(self, q):
+        self.q = q
+        self.backticks = {}
+        source = _QUERY_TOKENS.sub(self._preparse, q)
+        self.tree = ast.parse(source.strip(), mode='eval').body
+
+    def _preparse(self, match):
+        literal, backtick, local, amp, bar = match.groups()
+        if literal:
+            return literal
+        if backtick:
+            name = '__reframe_bt{}__'.format(len(self.backticks))
+            self.backticks[name] = backtick
+            return name
+        if local:
+            return _LOCAL_PREFIX + local
+        return ' and ' if amp else ' or '
+
+    def conjuncts(self, tree=None):
+        """return the subexpressions of a top level ``and`` as a list of trees"""
+        tree = self.tree if tree is None else tree
+        if isinstance(tree, ast.BoolOp) and isinstance(tree.op, ast.And):
+            return [c for value in tree.values for c in self.conjuncts(value)]
+        return [tree]
+
+    def names(self, tree=None):
+        """return the set of attribute names referenced by an expression tree"""
+        tree = self.tree if tree is None else tree
+        names = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Name) and not node.id.startswith(_LOCAL_PREFIX):
+                names.add(self.backticks.get(node.id, node.id).strip('`'))
+        return names
+
+    def to_query(self, tree=None):
+        """turn an expression tree back into a pandas query string"""
+        source = ast.unparse(self.tree if tree is None else tree)
+        for name, backtick in self.backticks.items():
+            source = source.replace(name, backtick)
+        return source.replace(_LOCAL_PREFIX, '@')
+
+
+_COMPARE = {'Eq': operator.eq, 'NotEq': operator.ne, 'Lt': operator.lt, 'LtE': operator.le,
+            'Gt': operator.gt, 'GtE': operator.ge}
+
+def _compare(op, left, right):
+    """compare two operands of a prepared query, a list on either side of == or in means any of its values"""
+    if isinstance(left, (list, tuple, set)) and op in ('Eq', 'NotEq'):
+        left, right = right, left
+    if op in ('In', 'NotIn') or (op in ('Eq', 'NotEq') and isinstance(right, (list, tuple, set))):
+        found = left.isin(list(right)) if isinstance(left, pd.Series) else np.isin(left, list(right))
+        return ~found if op in ('NotIn', 'NotEq') else found
+    return _COMPARE[op](left, right)
+
+def _negate(value):
+    """return not value, elementwise for columns"""
+    return ~value if isinstance(value, (pd.Series, np.ndarray)) else not value
+
+_QUERY_GLOBALS = {'__builtins__': {}, '_compare': _compare, '_negate': _negate}
+
+class _Compiler(ast.NodeTransformer):
+    """Rewrite a predicate tree to work on whole columns -- invisible to end user
+
+    Attributes become ``_c['col']``, parameters ``_p['name']``, and ``and``, ``or`` and ``not``
+    become ``&``, ``|`` and ``~`` since they cannot be applied to columns.
+    """
+    _ALLOWED = (ast.BinOp, ast.operator, ast.Constant, ast.List, ast.Tuple, ast.Set, ast.expr_context)
+
+    def __init__(self, pred):
+        self.pred = pred
+
+    def visit_Name(self, node):
+        if node.id.startswith(_LOCAL_PREFIX):
+            source, key = '_p', node.id[len(_LOCAL_PREFIX):]
+        else:
+            source, key = '_c', self.pred.backticks.get(node.id, node.id).strip('`')
+        return ast.Subscript(ast.Name(source, ast.Load()), ast.Constant(key), ast.Load())
+
+    def visit_BoolOp(self, node):
+        op = ast.BitAnd() if isinstance(node.op, ast.And) else ast.BitOr()
+        return functools.reduce(lambda a, b: ast.BinOp(a, op, b), [self.visit(v) for v in node.values])
+
+    def visit_UnaryOp(self, node):
+        if isinstance(node.op, ast.Not):
+            return ast.Call(ast.Name('_negate', ast.Load()), [self.visit(node.operand)], [])
+        return ast.UnaryOp(node.op, self.visit(node.operand))
+
+    def visit_Compare(self, node):
+        operands = [self.visit(n) for n in [node.left] + node.comparators]
+        terms = [ast.Call(ast.Name('_compare', ast.Load()), [ast.Constant(type(op).__name__), a, b], [])
+                 for op, a, b in zip(node.ops, operands, operands[1:])]
+        return functools.reduce(lambda a, b: ast.BinOp(a, ast.BitAnd(), b), terms)
+
+    def generic_visit(self, node):
+        if not isinstance(node, self._ALLOWED):
+            raise ValueError("{} is not supported in a prepared query".format(type(node).__name__))
+        return super().generic_visit(node)
+
+    def compile(self, tree):
+        """return a code object evaluating the expression tree on the frame _c and the parameters _p"""
+        body = self.visit(copy.deepcopy(tree))
+        return compile(ast.fix_missing_locations(ast.Expression(body)), '<query>', 'eval')
+
+
+class PreparedQuery:
+    """A query string compiled by Relation.prepare, see there
+
+    Call it with a relation and a value for each ``@`` parameter of the query string to get the rows of
+    the relation that match, as ``relation.query`` does.  ``params`` lists the names of the parameters.
+    """
+    def __init__(self, q):
+        self.q = q
+        self.pred = _Predicate(q)
+        self.params = sorted({node.id[len(_LOCAL_PREFIX):] for node in ast.walk(self.pred.tree)
+                              if isinstance(node, ast.Name) and node.id.startswith(_LOCAL_PREFIX)})
+        compiler = _Compiler(self.pred)
+        self.terms = [(term, compiler.compile(term)) for term in self.pred.conjuncts()]
+
+    def __call__(self, relation, **params):
+        """return a new relation with the tuples of relation matching the query for the given parameters"""
+        missing, unknown = set(self.params) - set(params), set(params) - set(self.params)
+        if missing or unknown:
+            raise TypeError("the query needs values for {} and no others".format(', '.join(self.params) or 'no parameters'))
+        if not isinstance(relation, Relation):
+            relation = Relation(relation)
+        frame, terms = relation, self.terms
+        if relation._indexes:
+            positions, rest = None, []
+            for term, code in terms:
+                found = _index_term(relation, self.pred, term, params)
+                if found is None:
+                    rest.append((term, code))
+                else:
+                    positions = found if positions is None else np.intersect1d(positions, found)
+            if positions is not None:
+                frame, terms = pd.DataFrame(relation).iloc[np.sort(positions)], rest
+        res = _evaluate(frame, [code for term, code in terms], params)
+        if relation._key is not None:
+            return _relation(res, relation._key)
+        return _relation(_distinct(res), list(res.columns))
+
+    def __repr__(self):
+        return 'PreparedQuery({!r})'.format(self.q)
+
+# the number of query strings Relation.prepare keeps compiled
+_PREPARED_QUERIES = 256
+
+@functools.lru_cache(maxsize=_PREPARED_QUERIES)
+def _prepare(q):
+    """return the PreparedQuery for q, compiling it the first time q is seen"""
+    return PreparedQuery(q)
+
+def _evaluate(frame, codes, params):
+    """return the rows of frame for which every compiled term in codes is true"""
+    names = {'_c': frame, '_p': params}
+    mask = np.ones(len(frame), dtype=bool)
+    for code in codes:
+        try:
+            found = eval(code, _QUERY_GLOBALS, names)
+        except TypeError:
+            # unordered categoricals only support == and !=, so compare their values instead
+            cats = [c for c in frame.columns if isinstance(frame[c].dtype, pd.CategoricalDtype)]
+            if not cats or names['_c'] is not frame:
+                raise
+            names['_c'] = pd.DataFrame(frame).astype({c: object for c in cats})
+            found = eval(code, _QUERY_GLOBALS, names)
+        mask &= np.asarray(found, dtype=bool)
+    # when every row matches the columns of frame are kept as they are instead of copied
+    return frame if mask.all() else frame[mask]
+
+
+class _PlanNode:
+    """One operator in the plan of a LazyRelation -- invisible to end user
+
+    ``op`` names the Relation operator, ``children`` are the plans of its input relations and
+    ``params`` holds the remaining arguments of the call.
+    """
+    def __init__(self, op, *children, **params):
+        self.op = op
+        self.children = children
+        self.params = params
+
+    def columns(self):
+        """return the list of attributes this node produces"""
+        if self.op == 'relation':
+            return list(self.params['relation'].columns)
+        if self.op in ('csv', 'file'):
+            return list(self.params['usecols'] or self.params['columns'])
+        if self.op == 'sqlite':
+            return list(self.params['columns'])
+        if self.op == 'groupby':
+            return list(self.params['cols']) + [name for name, col, func in _aggregates(self.params['aggs'])]
+        if self.op == 'project':
+            return list(self.params['cols'])
+        if self.op == 'rename':
+            return [self.params['new'] if c == self.params['old'] else c for c in self.children[0].columns()]
+        if self.op == 'njoin':
+            left = self.children[0].columns()
+            return left + [c for c in self.children[1].columns() if c not in left]
+        if self.op == 'cartesian_product':
+            left = self.children[0].columns()
+            right = self.children[1].columns()
+            return [c + '_x' if c in right else c for c in left] + [c + '_y' if c in left else c for c in right]
+        # query, sort, intersect, union and minus keep the attributes of their first input
+        return self.children[0].columns()
+
+
+# query, project and rename keep the labels of the rows they return, so a run of them only needs
+# to drop duplicate rows once, at the end of the run.  distinct is added by the optimizer when it
+# moves a selection out from above an operator that does not drop duplicates.
+_ROW_OPERATORS = ('project', 'query', 'rename', 'distinct')
+
+def _execute(node, dedup=True):
+    """Run a plan and return the resulting Relation, see _execute_node"""
+    if _profiler is not None:
+        return _profiler.run(node.op, _describe(node), None, _execute_node, node, dedup)
+    return _execute_node(node, dedup)
+
+def _describe(node):
+    """return the arguments of a plan node as a short string"""
+    if node.op == 'relation':
+        return '{} rows'.format(len(node.params['relation']))
+    return ', '.join('{}={}'.format(k, _brief(v)) for k, v in node.params.items()
+                     if k not in ('relation', 'source', 'types') and v is not None)
+
+def _execute_node(node, dedup=True):
+    """Run a plan and return the resulting Relation
+
+    When ``dedup`` is False the caller is a row operator that will drop duplicates itself, so
+    this node may skip its own drop_duplicates pass.  The key of the returned Relation is only set
+    when its rows are known to be distinct.
+    """
+    if node.op == 'relation':
+        return node.params['relation']
+    query = _sql(node)
+    if query is not None:
+        return _relation(_read_sql(*query))
+    if node.op == 'csv':
+        return _relation(_read_csv(**node.params))
+    if node.op == 'file':
+        return _relation(node.params['source'].read(node.params['usecols'], node.params['where']))
+    if node.op in _ROW_OPERATORS:
+        child = _execute(node.children[0], dedup=False)
+        frame, key = child, child._key
+        if node.op == 'project':
+            frame = frame[node.params['cols']]
+            key = key if child._distinct_on(node.params['cols']) else None
+        elif node.op == 'query':
+            frame = _select(frame, node.params['q'])
+        elif node.op == 'rename':
+            old, new = node.params['old'], node.params['new']
+            frame = pd.DataFrame.rename(frame, columns={old: new})
+            key = None if key is None else [new if x == old else x for x in key]
+        if dedup and key is None:
+            frame = _distinct(frame)
+            key = list(frame.columns)
+        return _relation(frame, key)
+    inputs = [_execute(child) for child in node.children]
+    if node.op == 'groupby':
+        return inputs[0].groupby(node.params['cols']).agg(**node.params['aggs'])
+    if node.op == 'sort':
+        return inputs[0].sort(*node.params['args'], **node.params['kwargs'])
+    return getattr(inputs[0], node.op)(*inputs[1:], **node.params)
+
+
+def _read_csv(filepath, sep, chunksize, columns, usecols, where):
+    """read a csv file in chunks, keeping only usecols and the rows that match where"""
+    chunks = [chunk if where is None else _select(chunk, where)
+              for chunk in pd.read_csv(filepath, sep=sep, usecols=usecols, chunksize=chunksize)]
+    if not chunks:
+        return pd.DataFrame(columns=usecols or columns)
+    return _categorize(pd.concat(chunks))
+
+
+# the number of bytes of a file _ColumnFile looks for row and field boundaries in at a time
+_OFFSETS_BLOCKSIZE = 1 << 24
+
+class _ColumnFile:
+    """A memory mapped csv file whose columns are parsed one at a time -- invisible to end user
+
+    ``starts`` holds the offset of every row in the file, followed by the end of the last row, and
+    ``ends[i, j]`` the offset of the separator or newline after field j of row i, counted from the
+    start of row i.  ``dtypes`` maps every column that has been parsed whole to its dtype, so that
+    the rows of it parsed later get the same dtype.  All three are saved in
+    ``filepath.offsets.npz`` together with the size and time of the file they were found in.
+    """
+    def __init__(self, filepath, sep):
+        self.filepath, self.sep = filepath, sep
+        self.data = np.memmap(filepath, dtype=np.uint8, mode='r') if os.path.getsize(filepath) else np.zeros(0, np.uint8)
+        header = bytes(self.data[:_OFFSETS_BLOCKSIZE]).split(b'\n', 1)[0]
+        self.columns = header.decode().rstrip('\r').split(sep)
+        self.loaded = {}
+        stat = os.stat(filepath)
+        self.version = np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+        try:
+            with np.load(filepath + '.offsets.npz') as offsets:
+                if (offsets['version'] == self.version).all() and str(offsets['sep']) == sep:
+                    self.starts, self.ends = offsets['starts'], offsets['ends']
+                    self.dtypes = json.loads(str(offsets['dtypes']))
+                    return
+        except (OSError, KeyError, ValueError):
+            pass
+        self.starts, self.ends = self._find_offsets(len(header) + 1)
+        self.dtypes = {}
+        self._save()
+
+    def _save(self):
+        """save the offsets and dtypes next to the file"""
+        saved = self.filepath + '.offsets.npz'
+        try:
+            fd, temp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(saved)), suffix='.tmp')
+        except OSError:
+            # a file in a directory that cannot be written to is indexed every time it is opened
+            return
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, starts=self.starts, ends=self.ends, version=self.version, sep=self.sep,
+                         dtypes=json.dumps(self.dtypes))
+            os.replace(temp, saved)
+        except OSError:
+            with contextlib.suppress(OSError):
+                os.remove(temp)
+
+    def _find_offsets(self, begin):
+        """return the row starts and field ends of the rows after the header, a block at a time
+
+        Blank lines, and lines that hold only the carriage return of a CRLF line end, are skipped, as
+        pandas skips them when it reads the file.  Files with double quotes are refused, because the
+        separators and newlines in quoted fields would be taken for field boundaries.
+        """
+        sep, width, size = ord(self.sep), len(self.columns), len(self.data)
+        starts, ends = [], []
+        # the number of lines before the block, the header included
+        line = 1
+        while begin < size:
+            block = self.data[begin:begin + _OFFSETS_BLOCKSIZE]
+            newlines = np.flatnonzero(block == 10)
+            if begin + len(block) < size:
+                if not len(newlines):
+                    raise ValueError("a row of {} is longer than {} bytes".format(self.filepath, _OFFSETS_BLOCKSIZE))
+                # rows that continue in the next block are left for it
+                block = block[:newlines[-1] + 1]
+            elif not len(newlines) or newlines[-1] != len(block) - 1:
+                # the last row may end without a newline
+                newlines = np.append(newlines, len(block))
+            if (block == 34).any():
+                raise ValueError("{} has quoted fields, which Relation.open cannot split; read it with "
+                                 "Relation(filepath) instead".format(self.filepath))
+            delims = np.flatnonzero((block == sep) | (block == 10))
+            if not len(delims) or delims[-1] != newlines[-1]:
+                delims = np.append(delims, newlines[-1])
+            block_end, lines = newlines[-1] + 1, len(newlines)
+            row_starts = np.concatenate([[0], newlines[:-1] + 1])
+            blank = (row_starts == newlines) | ((row_starts + 1 == newlines) & (block[np.minimum(row_starts, len(block) - 1)] == 13))
+            rows = np.flatnonzero(~blank)
+            if len(rows) < lines:
+                delims = delims[~np.isin(delims, newlines[blank])]
+                newlines, row_starts = newlines[rows], row_starts[rows]
+            if len(delims) != len(rows) * width or not (delims.reshape(len(rows), width)[:, -1] == newlines).all():
+                # every field but the last ends before the newline of its row
+                fields = np.bincount(np.searchsorted(newlines, delims), minlength=len(rows))
+                bad = rows[np.flatnonzero(fields != width)[0]]
+                raise ValueError("line {} of {} does not have {} fields".format(line + bad + 1, self.filepath, width))
+            ends.append((delims.reshape(len(rows), width) - row_starts[:, None]).astype(np.uint32))
+            starts.append(row_starts + begin)
+            begin += block_end
+            line += lines
+        starts.append([size])
+        ends = np.concatenate(ends) if ends else np.zeros((0, width), dtype=np.uint32)
+        if len(ends) and ends.max() < 1 << 16:
+            ends = ends.astype(np.uint16)
+        return np.concatenate(starts).astype(np.int64), ends
+
+    def column(self, col, rows=None):
+        """return the values of col parsed from the file, for the given row positions or every row
+
+        The dtype pandas infers depends on every value of the column, so a column is parsed whole
+        the first time, and only the given rows of it once its dtype is known.
+        """
+        if col in self.loaded or (rows is not None and col not in self.dtypes):
+            values = self.loaded[col] if col in self.loaded else self.column(col)
+            return values if rows is None else values.iloc[rows].reset_index(drop=True)
+        j = self.columns.index(col)
+        positions = slice(None) if rows is None else rows
+        row_starts = self.starts[:-1][positions]
+        ends = row_starts + self.ends[positions, j]
+        begins = row_starts + (self.ends[positions, j - 1] + 1 if j else 0)
+        parts = []
+        for first in range(0, len(begins), SCAN_CHUNKSIZE):
+            parts.append(self._gather(begins[first:first + SCAN_CHUNKSIZE], ends[first:first + SCAN_CHUNKSIZE]))
+        values = pd.read_csv(io.BytesIO(b''.join(parts)), sep=self.sep, header=None, names=[col],
+                             skip_blank_lines=False, quoting=csv.QUOTE_NONE,
+                             dtype=None if rows is None else {col: self.dtypes[col]})[col]
+        if rows is None:
+            values = _categorize(values.to_frame())[col]
+            self.loaded[col] = values
+            if self.dtypes.get(col) != str(values.dtype):
+                self.dtypes[col] = str(values.dtype)
+                self._save()
+        return values
+
+    def _gather(self, begins, ends):
+        """return the bytes of the fields from begins to ends, one per line"""
+        if not len(begins):
+            return b''
+        lengths = (ends - begins).astype(np.int64)
+        # every field is copied along with the separator or newline after it, which becomes a newline
+        finished = np.cumsum(lengths + 1)
+        sources = np.arange(finished[-1]) + np.repeat(begins - (finished - lengths - 1), lengths + 1)
+        # the newline after the last row may be missing from the file
+        np.minimum(sources, len(self.data) - 1, out=sources)
+        text = self.data[sources]
+        text[finished - 1] = 10
+        return text.tobytes()
+
+    def read(self, usecols, where):
+        """return the columns usecols, or all of them, of the rows that match the query string where"""
+        usecols = list(usecols or self.columns)
+        rows = None
+        if where is not None:
+            # a condition without attributes still needs a column to have rows
+            names = [c for c in self.columns if c in _Predicate(where).names()] or self.columns[:1]
+            frame = pd.DataFrame({c: self.column(c) for c in names})
+            rows = np.asarray(_select(frame, where).index)
+        frame = pd.DataFrame({c: self.column(c, rows) for c in usecols})
+        if rows is None:
+            # every column was parsed whole and dictionary encoded when it was loaded
+            frame.index = pd.RangeIndex(len(self.ends))
+            return frame
+        frame.index = rows
+        return frame
+
+
+def _optimize(node):
+    """Rewrite a plan so that selections and projections run as early as possible
+
+    Adjacent selections and adjacent projections are merged, selections are moved below projections,
+    sorts, joins, products and the set operators, and joins and products only carry the attributes
+    that are used above them.
+    """
+    node = _PlanNode(node.op, *[_optimize(child) for child in node.children], **node.params)
+    if node.op == 'query':
+        return _push_selection(node.children[0], node.params['q'])
+    if node.op == 'project':
+        return _push_projection(node.children[0], node.params['cols'])
+    return node
+
+def _push_selection(child, q):
+    """return a plan equivalent to selecting q from child with the selection pushed down"""
+    try:
+        pred = _Predicate(q)
+    except SyntaxError:
+        return _PlanNode('query', child, q=q)
+    if child.op == 'query':
+        return _push_selection(child.children[0], '({}) and ({})'.format(child.params['q'], q))
+    if child.op in ('csv', 'file') and pred.names() <= set(child.columns()):
+        where = q if child.params['where'] is None else '({}) and ({})'.format(child.params['where'], q)
+        # a selection drops duplicate rows, which reading a file does not
+        return _PlanNode('distinct', _PlanNode(child.op, **dict(child.params, where=where)))
+    if child.op == 'sort' and child.params['kwargs'].get('limit') is not None:
+        # selecting from the first rows of a sort is not the same as the first rows of a selection
+        return _PlanNode('query', child, q=q)
+    if child.op in ('project', 'sort', 'distinct') and pred.names() <= set(child.columns()):
+        return _PlanNode(child.op, _push_selection(child.children[0], q), **child.params)
+    if child.op not in ('njoin', 'cartesian_product', 'intersect', 'union', 'minus'):
+        return _PlanNode('query', child, q=q)
+
+    left, right = child.children
+    if child.op == 'cartesian_product':
+        # attributes that appear on both sides are renamed by the product, so leave them alone
+        shared = set(left.columns()) & set(right.columns())
+        left_cols = set(left.columns()) - shared
+        right_cols = set(right.columns()) - shared
+    else:
+        left_cols = set(left.columns())
+        right_cols = set(right.columns())
+    left_terms, right_terms, kept = [], [], []
+    for term in pred.conjuncts():
+        names = pred.names(term)
+        if child.op in ('intersect', 'union'):
+            left_terms.append(term)
+            right_terms.append(term)
+        elif child.op == 'minus':
+            left_terms.append(term)
+        elif names <= left_cols or names <= right_cols:
+            if names <= left_cols:
+                left_terms.append(term)
+            if names <= right_cols and child.params.get('algorithm') != 'index':
+                right_terms.append(term)
+            elif not names <= left_cols:
+                # filtering the right side would lose the index the join was asked to use
+                kept.append(term)
+        else:
+            kept.append(term)
+    if left_terms:
+        left = _push_selection(left, _conjoin(pred, left_terms))
+    if right_terms:
+        right = _push_selection(right, _conjoin(pred, right_terms))
+    node = _PlanNode(child.op, left, right, **child.params)
+    if kept and child.op == 'cartesian_product':
+        # what is left is a theta condition, filter the product as it is built
+        where = _conjoin(pred, kept)
+        if child.params.get('where') is not None:
+            where = '({}) and {}'.format(child.params['where'], where)
+        node.params = dict(child.params, where=where)
+        return node
+    if kept:
+        return _PlanNode('query', node, q=_conjoin(pred, kept))
+    if child.op in ('intersect', 'union', 'minus', 'cartesian_product'):
+        return node
+    # a selection drops duplicate rows, which njoin does not
+    return _PlanNode('distinct', node)
+
+def _conjoin(pred, terms):
+    """return a query string that is the ``and`` of the expression trees in terms"""
+    return ' and '.join('({})'.format(pred.to_query(term)) for term in terms)
+
+def _push_projection(child, cols):
+    """return a plan equivalent to projecting child onto cols with the projection pushed down"""
+    if child.op in ('project', 'distinct'):
+        return _push_projection(child.children[0], cols)
+    if child.op in ('csv', 'file'):
+        needed = set(cols)
+        if child.params['where'] is not None:
+            needed |= _Predicate(child.params['where']).names()
+        usecols = [c for c in child.columns() if c in needed]
+        return _PlanNode('project', _PlanNode(child.op, **dict(child.params, usecols=usecols)), cols=cols)
+    if child.op == 'query':
+        try:
+            needed = _Predicate(child.params['q']).names() | set(cols)
+        except SyntaxError:
+            return _PlanNode('project', child, cols=cols)
+        below = child.children[0].columns()
+        if needed < set(below):
+            inner_cols = [c for c in below if c in needed]
+            node = _PlanNode('query', _push_projection(child.children[0], inner_cols), **child.params)
+            return node if inner_cols == cols else _PlanNode('project', node, cols=cols)
+        return _PlanNode('project', child, cols=cols)
+    if child.op not in ('njoin', 'cartesian_product', 'union'):
+        return _PlanNode('project', child, cols=cols)
+
+    left, right = child.children
+    wanted = set(cols)
+    if child.op == 'union':
+        shared = set()
+    else:
+        # keep the join attributes, and for a product the attributes it renames, on both sides
+        shared = set(left.columns()) & set(right.columns())
+    if child.params.get('where') is not None:
+        try:
+            wanted |= _Predicate(child.params['where']).names()
+        except SyntaxError:
+            return _PlanNode('project', child, cols=cols)
+    left = _narrow(left, [c for c in left.columns() if c in wanted or c in shared])
+    right = _narrow(right, [c for c in right.columns() if c in wanted or c in shared])
+    return _PlanNode('project', _PlanNode(child.op, left, right, **child.params), cols=cols)
+
+def _narrow(node, cols):
+    """project node onto cols when that removes any attributes"""
+    if not cols:
+        # a relation needs at least one attribute to keep its rows
+        cols = node.columns()[:1]
+    if len(cols) == len(node.columns()):
+        return node
+    return _push_projection(node, cols)
+
+
+# the operators of a query string as SQL, != is written as a negated = so that it holds for NULLs
+_SQL_COMPARE = {ast.Eq: '=', ast.Lt: '<', ast.LtE: '<=', ast.Gt: '>', ast.GtE: '>='}
+_SQL_ARITHMETIC = {ast.Add: '+', ast.Sub: '-', ast.Mult: '*'}
+# the operators whose SQL returns distinct rows
+_SQL_DISTINCT = ('project', 'query', 'rename', 'distinct', 'union', 'intersect', 'minus', 'groupby')
+_SQL_AGGREGATES = {'count': 'COUNT({})', 'sum': 'COALESCE(SUM({}), 0)', 'mean': 'AVG({})', 'min': 'MIN({})',
+                   'max': 'MAX({})'}
+
+def _sql_name(name):
+    """return an attribute or table name quoted for SQL"""
+    return '"{}"'.format(str(name).replace('"', '""'))
+
+def _sql(node):
+    """return (database, sql, params) when SQLite can run the whole plan node, otherwise None"""
+    try:
+        return _sql_select(node)
+    except ValueError:
+        return None
+
+def _sql_select(node):
+    """translate a plan into one SQL select statement, ValueError when some part of it cannot be"""
+    if node.op == 'sqlite':
+        cols = ', '.join(_sql_name(c) for c in node.params['columns'])
+        return node.params['database'], 'SELECT {} FROM {}'.format(cols, _sql_name(node.params['table'])), []
+    if node.op not in ('project', 'query', 'rename', 'distinct', 'njoin', 'union', 'intersect', 'minus', 'groupby'):
+        raise ValueError("{} is not translated to SQL".format(node.op))
+    inputs = [_sql_select(child) for child in node.children]
+    if len({database for database, sql, params in inputs}) != 1:
+        raise ValueError("the relations are in different databases")
+    database, inner, params = inputs[0][0], inputs[0][1], [p for i in inputs for p in i[2]]
+    cols = ', '.join(_sql_name(c) for c in node.columns())
+    # every operator but njoin returns distinct rows, as the Relation operators do, and a selection
+    # of distinct rows is distinct without asking SQLite for it
+    distinct = '' if node.children[0].op in _SQL_DISTINCT else 'DISTINCT '
+    if node.op == 'project':
+        sql = 'SELECT DISTINCT {} FROM ({})'.format(cols, inner)
+    elif node.op == 'distinct':
+        sql = 'SELECT {}* FROM ({})'.format(distinct, inner)
+    elif node.op == 'query':
+        try:
+            pred = _Predicate(node.params['q'])
+        except SyntaxError:
+            raise ValueError("the query cannot be parsed")
+        condition = _sql_condition(pred, pred.tree, params, _sql_types(node.children[0]))
+        sql = 'SELECT {}* FROM ({}) WHERE {}'.format(distinct, inner, condition)
+    elif node.op == 'rename':
+        old, new = node.params['old'], node.params['new']
+        renamed = ['{} AS {}'.format(_sql_name(c), _sql_name(new)) if c == old else _sql_name(c)
+                   for c in node.children[0].columns()]
+        sql = 'SELECT {}{} FROM ({})'.format(distinct, ', '.join(renamed), inner)
+    elif node.op == 'njoin':
+        left, right = node.children[0].columns(), node.children[1].columns()
+        shared = [c for c in left if c in right]
+        # IS matches missing values with each other, as the pandas engine does
+        on = ' AND '.join('l.{0} IS r.{0}'.format(_sql_name(c)) for c in shared)
+        picked = ['l.' + _sql_name(c) for c in left] + ['r.' + _sql_name(c) for c in right if c not in left]
+        sql = 'SELECT {} FROM ({}) AS l JOIN ({}) AS r ON {}'.format(', '.join(picked), inner, inputs[1][1], on)
+    elif node.op == 'groupby':
+        keys = ', '.join(_sql_name(c) for c in node.params['cols'])
+        aggregates = []
+        for name, col, func in _aggregates(node.params['aggs']):
+            if func not in _SQL_AGGREGATES:
+                raise ValueError("SQLite has no {}".format(func))
+            aggregates.append('{} AS {}'.format(_SQL_AGGREGATES[func].format(_sql_name(col)), _sql_name(name)))
+        # groupby leaves out the rows with a missing group by attribute
+        present = ' AND '.join('{} IS NOT NULL'.format(_sql_name(c)) for c in node.params['cols'])
+        sql = 'SELECT {}, {} FROM ({}) WHERE {} GROUP BY {}'.format(keys, ', '.join(aggregates), inner, present, keys)
+    else:
+        # SQLite compares NULLs as equal in compound selects, as the pandas engine does
+        keyword = {'union': 'UNION', 'intersect': 'INTERSECT', 'minus': 'EXCEPT'}[node.op]
+        sql = 'SELECT {0} FROM ({1}) {2} SELECT {0} FROM ({3})'.format(cols, inner, keyword, inputs[1][1])
+    return database, sql, params
+
+def _sql_condition(pred, tree, params, types):
+    """translate a query expression tree into a SQL condition, appending the values it uses to params
+
+    A comparison with a missing value is false in pandas and NULL in SQL, which a WHERE clause treats
+    the same way, as long as it is not negated.  A negated condition is true unless the condition is
+    true, so ``not`` becomes ``IS NOT 1`` instead of NOT.  SQLite converts between numbers and text
+    when it compares them, where pandas finds them unequal, so only values of the same kind are
+    compared in SQL, see _sql_types.
+    """
+    if isinstance(tree, ast.BoolOp):
+        joiner = ' AND ' if isinstance(tree.op, ast.And) else ' OR '
+        return '({})'.format(joiner.join(_sql_condition(pred, value, params, types) for value in tree.values))
+    if isinstance(tree, ast.UnaryOp) and isinstance(tree.op, ast.Not):
+        return '({} IS NOT 1)'.format(_sql_condition(pred, tree.operand, params, types))
+    if not isinstance(tree, ast.Compare):
+        raise ValueError("{} is not a condition SQL can evaluate".format(type(tree).__name__))
+    terms = []
+    operands = [tree.left] + tree.comparators
+    for op, left, right in zip(tree.ops, operands, operands[1:]):
+        kinds = {_sql_kind(pred, node, types) for node in [left] + list(getattr(right, 'elts', [right]))}
+        if len(kinds) > 1:
+            raise ValueError("numbers and text are compared differently by SQLite")
+        if isinstance(right, (ast.List, ast.Tuple, ast.Set)) and type(op) in (ast.Eq, ast.NotEq, ast.In, ast.NotIn):
+            value = _sql_operand(pred, left, params)
+            values = ', '.join(_sql_operand(pred, v, params) for v in right.elts)
+            if type(op) in (ast.Eq, ast.In):
+                terms.append('{} IN ({})'.format(value, values))
+            else:
+                terms.append('({0} IS NULL OR {0} NOT IN ({1}))'.format(value, values))
+        elif isinstance(op, ast.NotEq):
+            terms.append('(({} = {}) IS NOT 1)'.format(_sql_operand(pred, left, params), _sql_operand(pred, right, params)))
+        elif type(op) in _SQL_COMPARE:
+            terms.append('{} {} {}'.format(_sql_operand(pred, left, params), _SQL_COMPARE[type(op)],
+                                           _sql_operand(pred, right, params)))
+        else:
+            raise ValueError("{} is not translated to SQL".format(type(op).__name__))
+    return terms[0] if len(terms) == 1 else '({})'.format(' AND '.join(terms))
+
+def _sql_operand(pred, tree, params):
+    """translate an attribute, literal or arithmetic expression into SQL"""
+    if isinstance(tree, ast.Name):
+        if tree.id.startswith(_LOCAL_PREFIX):
+            raise ValueError("local variables are not translated to SQL")
+        return _sql_name(pred.backticks.get(tree.id, tree.id).strip('`'))
+    if isinstance(tree, ast.Constant) and isinstance(tree.value, (str, int, float)):
+        params.append(int(tree.value) if isinstance(tree.value, bool) else tree.value)
+        return '?'
+    if isinstance(tree, ast.UnaryOp) and isinstance(tree.op, ast.USub):
+        return '(-{})'.format(_sql_operand(pred, tree.operand, params))
+    if isinstance(tree, ast.BinOp) and type(tree.op) in _SQL_ARITHMETIC:
+        return '({} {} {})'.format(_sql_operand(pred, tree.left, params), _SQL_ARITHMETIC[type(tree.op)],
+                                   _sql_operand(pred, tree.right, params))
+    raise ValueError("{} is not translated to SQL".format(type(tree).__name__))
+
+def _sql_kind(pred, tree, types):
+    """return 'number' or 'text' for an operand of a query, ValueError when SQLite may not compare it
+    as pandas does"""
+    if isinstance(tree, ast.Name):
+        kind = types.get(pred.backticks.get(tree.id, tree.id).strip('`'))
+    elif isinstance(tree, ast.Constant):
+        kind = 'text' if isinstance(tree.value, str) else 'number'
+    elif isinstance(tree, (ast.UnaryOp, ast.BinOp)):
+        # arithmetic on text is left to pandas
+        operands = [tree.operand] if isinstance(tree, ast.UnaryOp) else [tree.left, tree.right]
+        kind = 'number' if all(_sql_kind(pred, x, types) == 'number' for x in operands) else None
+    else:
+        kind = None
+    if kind is None:
+        raise ValueError("the kind of value of {} is not known".format(type(tree).__name__))
+    return kind
+
+def _sql_types(node):
+    """return 'number' or 'text' for the attributes of a plan SQLite runs, from the types declared in
+    the tables, None where it is neither"""
+    if node.op == 'sqlite':
+        return {c: _sql_affinity(t) for c, t in node.params['types'].items()}
+    types = _sql_types(node.children[0])
+    if node.op == 'rename':
+        return {node.params['new'] if c == node.params['old'] else c: t for c, t in types.items()}
+    if node.op == 'njoin':
+        return {**_sql_types(node.children[1]), **types}
+    if node.op == 'groupby':
+        res = {c: types.get(c) for c in node.params['cols']}
+        for name, col, func in _aggregates(node.params['aggs']):
+            res[name] = types.get(col) if func in ('min', 'max') else 'number'
+        return res
+    return types
+
+def _sql_affinity(declared):
+    """return 'number' or 'text' for a declared SQLite column type, None for any other, following the
+    rules SQLite uses for the affinity of a column"""
+    declared = declared.upper()
+    if 'INT' in declared:
+        return 'number'
+    if any(name in declared for name in ('CHAR', 'CLOB', 'TEXT')):
+        return 'text'
+    if any(name in declared for name in ('REAL', 'FLOA', 'DOUB')):
+        return 'number'
+    return None
+
+def _read_sql(database, sql, params):
+    """run a select statement in a SQLite database and return its rows"""
+    connection = sqlite3.connect(database)
+    try:
+        return _categorize(pd.read_sql_query(sql, connection, params=params))
+    finally:
+        connection.close()
+
+def _aggregates(aggs):
+    """return (name, col, func) for the aggregates given to agg as func=col or func=[cols]"""
+    return [(func + "_" + col, col, func) for func, cols in aggs.items() for col in ([cols] if type(cols) == str else cols)]
+
+
+class LazyRelation:
+    """A Relation whose operators are recorded in a plan and only run when the result is needed
+
+    A LazyRelation is created with ``Relation.lazy()``.  It supports the same operators as a Relation
+    and each of them returns a new LazyRelation.  The plan runs when you call ``collect()`` or ``head()``
+    or when the relation is printed, and gives the same result as calling the operators on the Relation
+    directly.
+
+    :param plan: the _PlanNode at the root of the plan
+
+    :Example:
+
+    >>> from reframe import Relation
+    >>> country = Relation('country.csv')
+    >>> asia = country.lazy().query('continent == "Asia"').project(['name','region'])
+    >>> asia.query('region == "Middle East"').rename('name','country').head()
+                     country       region
+    10  United Arab Emirates  Middle East
+    12               Armenia  Middle East
+    15            Azerbaijan  Middle East
+    17               Bahrain  Middle East
+    55               Georgia  Middle East
+    >>>
+    """
+    def __init__(self, plan):
+        self.plan = plan
+
+    @property
+    def columns(self):
+        """the list of attributes of the relation, computed without running the plan"""
+        return self.plan.columns()
+
+    def project(self, cols):
+        """record a projection on the given list of columns, see Relation.project"""
+        if type(cols) != list:
+            raise ValueError("You must provide the attributes to project inside square brackets []")
+        for name in cols:
+            if name not in self.columns:
+                raise ValueError("'{}' is not a valid attribute name in relation".format(name))
+        return LazyRelation(_PlanNode('project', self.plan, cols=cols))
+
+    def query(self, q):
+        """record a selection of the tuples matching the query string, see Relation.query"""
+        return LazyRelation(_PlanNode('query', self.plan, q=q))
+
+    def sort(self, *args, **kwargs):
+        """record a sort on the given columns, see Relation.sort
+
+        A selection after a sort with a limit selects from the limit rows, as it does on a Relation.
+
+        :Example:
+
+        >>> from reframe import Relation
+        >>> country = Relation('country.csv')
+        >>> country.lazy().sort('gnp', ascending=False, limit=10).query('continent == "Europe"').project(['name']).collect()
+                       name
+        176         Germany
+        164          France
+        29   United Kingdom
+        77            Italy
+        46            Spain
+
+        """
+        return LazyRelation(_PlanNode('sort', self.plan, args=args, kwargs=kwargs))
+
+    def rename(self, old, new):
+        """record the renaming of attribute old to new, see Relation.rename"""
+        return LazyRelation(_PlanNode('rename', self.plan, old=old, new=new))
+
+    def intersect(self, other, algorithm='auto'):
+        """record the intersection with another relation, see Relation.intersect"""
+        other = _as_plan(other)
+        if sorted(self.columns) != sorted(other.columns()):
+            raise ValueError("Relations must be Union compatible")
+        return LazyRelation(_PlanNode('intersect', self.plan, other, algorithm=algorithm))
+
+    def njoin(self, other, algorithm='auto'):
+        """record the natural join with another relation, see Relation.njoin"""
+        other = _as_plan(other)
+        if not [x for x in self.columns if x in other.columns()]:
+            raise ValueError("The two relations must have some columns in common")
+        return LazyRelation(_PlanNode('njoin', self.plan, other, algorithm=algorithm))
+
+    def union(self, other):
+        """record the union with another relation, see Relation.union"""
+        other = _as_plan(other)
+        if sorted(self.columns) != sorted(other.columns()):
+            raise ValueError("Relations must be Union compatible")
+        return LazyRelation(_PlanNode('union', self.plan, other))
+
+    def minus(self, other):
+        """record the rows of this relation 'but not' those in other, see Relation.minus"""
+        other = _as_plan(other)
+        if sorted(self.columns) != sorted(other.columns()):
+            raise ValueError("Relations must be Union compatible")
+        return LazyRelation(_PlanNode('minus', self.plan, other))
+
+    def groupby(self, cols):
+        """record a grouping on the given columns, aggregate it with the methods of the LazyGroupWrap
+
+        :param cols: a column name or a list of column names
+        :return: a LazyGroupWrap
+        """
+        return LazyGroupWrap(self.plan, [cols] if type(cols) == str else list(cols))
+
+    def cartesian_product(self, other, where=None, chunksize=None):
+        """record the cartesian product with another relation, see Relation.cartesian_product
+
+        A selection recorded after the product is moved into its ``where`` condition by the optimizer,
+        so the product is filtered chunk by chunk.
+        """
+        node = _PlanNode('cartesian_product', self.plan, _as_plan(other), where=where, chunksize=chunksize)
+        return LazyRelation(node)
+
+    def explain(self, analyze=False, optimize=True):
+        """Show the plan as a tree of operators, with analyze=True run it and measure every operator
+
+        Printing the returned Profile shows the tree, ``to_json()`` exports it.  With analyze=True
+        the plan runs as in collect and every node records its time, rows and memory, see profile.
+
+        :param analyze: Boolean, run the plan and measure it
+        :param optimize: Boolean, optimize=False shows the plan exactly as the operators were called
+        :return: a Profile
+
+        :Example:
+
+        >>> from reframe import Relation
+        >>> country = Relation('country.csv')
+        >>> print(country.lazy().query('continent == "Asia"').project(['name','region']).explain())
+        project(cols=['name', 'region'])
+          query(q='continent == "Asia"')
+            project(cols=['name', 'continent', 'region'])
+              relation(239 rows)
+        >>> [(r['operator'], r['input_rows'], r['output_rows']) for r in country.lazy().query('continent == "Asia"').explain(analyze=True).walk()]
+        [('query', [239], 51), ('relation', [], 239)]
+        >>>
+        """
+        plan = _optimize(self.plan) if optimize else self.plan
+        if analyze:
+            with profile() as res:
+                _execute(plan)
+            return res
+        res = Profile()
+        res.roots = [_plan_record(plan)]
+        return res
+
+    def optimize(self):
+        """return an equivalent LazyRelation whose selections and projections run as early as possible
+
+        Selections and projections are moved below joins, products and the set operators, and
+        adjacent selections and adjacent projections are merged into one.  The optimized plan returns
+        the same tuples, although row labels may differ when a selection moves below a join.
+
+        :return: a LazyRelation
+        """
+        return LazyRelation(_optimize(self.plan))
+
+    def collect(self, optimize=True):
+        """run the plan and return the result as a Relation
+
+        :param optimize: Boolean, optimize=False runs the operators exactly in the order they were called
+        :return: a Relation
+        """
+        plan = _optimize(self.plan) if optimize else self.plan
+        return _execute(plan)
+
+    def head(self, n=5):
+        """run the plan and return the first n rows as a Relation
+
+        :param n: the number of rows to return
+        :return: a Relation
+        """
+        if self.plan.op == 'sort':
+            # a sort followed by head only needs to find the first n rows, see Relation.sort
+            kwargs = dict(self.plan.params['kwargs'])
+            kwargs['limit'] = n if kwargs.get('limit') is None else min(n, kwargs['limit'])
+            node = _PlanNode('sort', *self.plan.children, args=self.plan.params['args'], kwargs=kwargs)
+            return LazyRelation(node).collect()
+        res = self.collect()
+        return _relation(res.head(n), res._key)
+
+    def __repr__(self):
+        return repr(self.collect())
+
+    def _repr_html_(self):
+        return self.collect()._repr_html_()
+
+
+class LazyGroupWrap:
+    """The groups of a LazyRelation, whose aggregates are recorded in the plan, see GroupWrap"""
+
+    def __init__(self, plan, cols):
+        self.plan = plan
+        self.gb_cols = cols
+
+    def agg(self, **aggs):
+        """record several aggregates of every group, see GroupWrap.agg"""
+        for func in aggs:
+            if func not in ('count', 'sum', 'mean', 'median', 'min', 'max'):
+                raise ValueError("'{}' is not an aggregate operator".format(func))
+        return LazyRelation(_PlanNode('groupby', self.plan, cols=self.gb_cols, aggs=aggs))
+
+    def aggregate(self, func, col):
+        """record the aggregate function named func of a single column of every group"""
+        return self.agg(**{func: col})
+
+    def count(self, col):
+        """record the number of values of col in every group"""
+        return self.agg(count=col)
+
+    def mean(self, col):
+        """record the mean of col in every group"""
+        return self.agg(mean=col)
+
+    def min(self, col):
+        """record the minimum of col in every group"""
+        return self.agg(min=col)
+
+    def max(self, col):
+        """record the maximum of col in every group"""
+        return self.agg(max=col)
+
+    def sum(self, col):
+        """record the sum of col in every group"""
+        return self.agg(sum=col)
+
+    def median(self, col):
+        """record the median of col in every group, which SQLite leaves to pandas"""
+        return self.agg(median=col)
+
+
+def _plan_record(node):
+    """return a Profile record for a plan that has not run"""
+    return {'operator': node.op, 'detail': _describe(node), 'seconds': None, 'self_seconds': None,
+            'dedup_seconds': None, 'input_rows': None, 'output_rows': None, 'bytes': None,
+            'children': [_plan_record(child) for child in node.children], 'plan': True}
+
+
+def _as_plan(other):
+    """return the plan for a Relation, DataFrame or LazyRelation used as an operator argument"""
+    if isinstance(other, LazyRelation):
+        return other.plan
+    if not isinstance(other, Relation):
+        other = Relation(other)
+    return _PlanNode('relation', relation=other)
+
+
+if __name__ == '__main__':
+    #country = Relation('country.csv')
+    import doctest
+    doctest.testmod()
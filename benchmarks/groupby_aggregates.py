@@ -0,0 +1,57 @@
+"""Time the GroupWrap aggregates on country.csv repeated to over a million rows
+
+Each aggregate of reframe computes only the requested column.  For comparison the same aggregate is
+also run over every column and cut down to the requested one afterwards, which is how the
+aggregates used to work.  sum and mean are not compared that way: over every column sum
+concatenates all the strings, which takes minutes, and mean fails on them.
+
+Run from the root of the repository::
+
+    python benchmarks/groupby_aggregates.py [rows]
+"""
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pandas as pd
+from reframe import Relation
+
+AGGREGATES = [('count', 'name'), ('min', 'surfacearea'), ('max', 'surfacearea'), ('sum', 'surfacearea'),
+              ('mean', 'lifeexpectancy'), ('median', 'lifeexpectancy')]
+
+
+def best(func, runs=3):
+    """return the fastest of runs calls of func, in seconds"""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def every_column(frame, cols, func, col):
+    """aggregate every column, then keep the requested one, as the aggregates used to"""
+    res = getattr(frame.groupby(cols, observed=True), func)().reset_index()
+    return res[cols + [col]].drop_duplicates()
+
+
+def main(rows=1000000):
+    country = Relation(os.path.join(ROOT, 'country.csv'))
+    big = Relation(pd.concat([country] * -(-rows // len(country)), ignore_index=True))
+    frame = pd.DataFrame(big)
+    print('{} rows, {} columns, groupby continent'.format(len(big), len(big.columns)))
+    for func, col in AGGREGATES:
+        new = best(lambda: getattr(big.groupby(['continent']), func)(col))
+        line = '{:7} {:15} {:8.3f} s'.format(func, col, new)
+        if func in ('count', 'min', 'max'):
+            old = best(lambda: every_column(frame, ['continent'], func, col))
+            line += '   every column {:8.3f} s   {:5.1f}x'.format(old, old / new)
+        print(line)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,48 @@
+"""Time how long ``import reframe`` takes, and the first Relation, which pays for importing pandas
+
+Run from the root of the repository::
+
+    python benchmarks/startup.py [runs]
+
+Every run starts a fresh interpreter, so nothing is imported yet.
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT = """
+import sys, time
+start = time.perf_counter()
+import reframe
+elapsed = time.perf_counter() - start
+print(elapsed, 'pandas' in sys.modules)
+"""
+
+FIRST_RELATION = """
+import time
+import reframe
+start = time.perf_counter()
+reframe.Relation('country.csv')
+print(time.perf_counter() - start, True)
+"""
+
+
+def run(code):
+    """return the seconds a snippet reports and whether pandas was imported, in a new interpreter"""
+    out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True, capture_output=True,
+                         text=True, env=dict(os.environ, PYTHONPATH=ROOT)).stdout.split()
+    return float(out[0]), out[1] == 'True'
+
+
+def main(runs=5):
+    for name, code in (('import reframe', IMPORT), ("first Relation('country.csv')", FIRST_RELATION)):
+        results = [run(code) for _ in range(runs)]
+        times = sorted(seconds for seconds, _ in results)
+        print('{:32} min {:8.1f} ms  median {:8.1f} ms  pandas imported: {}'.format(
+            name, times[0] * 1000, times[len(times) // 2] * 1000, results[0][1]))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
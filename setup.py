@@ -7,10 +7,12 @@ setup(
     name='reframe',
     description='Relational algebra on top of Pandas DataFrames ',
     version='1.0.0',
-    py_modules = ['reframe'],
+    py_modules = ['reframe', '_reframe'],
     author = 'Brad Miller',
     author_email = 'bonelake@mac.com',
-    install_requires= ['pandas>=0.16.0'],
+    python_requires='>=3.9',
+    install_requires= ['pandas>=1.5'],
+    extras_require = {'feather': ['pyarrow']},
     include_package_data = False,
     license='GPL',
     url = 'https://github.com/bnmnetp/reframe',
@@ -22,8 +24,8 @@ setup(
                    'Operating System :: MacOS',
                    'Operating System :: Unix',
                    'Programming Language :: Python',
-                   'Programming Language :: Python :: 2.7',
-                   'Programming Language :: Python :: 3.4',
+                   'Programming Language :: Python :: 3',
+                   'Programming Language :: Python :: 3.9',
                    'Topic :: Education'),
     long_description=open('README.rst').read(),
 )
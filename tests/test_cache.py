@@ -0,0 +1,35 @@
+"""Check that the result cache only returns results for the same arguments, see set_result_cache
+
+Run from the root of the repository with ``python -m unittest discover tests``.
+"""
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from reframe import Relation, set_result_cache
+
+
+class Indexes(unittest.TestCase):
+
+    def setUp(self):
+        set_result_cache()
+        self.addCleanup(set_result_cache, 0)
+        self.path = os.path.join(ROOT, 'country.csv')
+
+    def test_index_join_needs_index_after_hit(self):
+        small = Relation(self.path).query('continent == "Europe"').project(['code', 'name'])
+        self.assertEqual(len(small.njoin(Relation(self.path).create_index('code'), algorithm='index')), 46)
+        with self.assertRaises(ValueError):
+            small.njoin(Relation(self.path), algorithm='index')
+
+    def test_result_keeps_indexes(self):
+        Relation(self.path).project(['code', 'name'])
+        projected = Relation(self.path).create_index('code', kind='sorted').project(['code', 'name'])
+        self.assertEqual(list(projected._indexes), ['code'])
+
+
+if __name__ == '__main__':
+    unittest.main()
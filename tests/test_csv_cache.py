@@ -0,0 +1,38 @@
+"""Check that the binary cache of csv files gives the rows of the csv file, see set_csv_cache
+
+Run from the root of the repository with ``python -m unittest discover tests``.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from reframe import Relation, set_csv_cache
+
+
+class CsvCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        set_csv_cache(self.directory)
+        self.addCleanup(set_csv_cache, None)
+        self.path = os.path.join(ROOT, 'country.csv')
+
+    def test_damaged_cache_is_replaced(self):
+        expected = Relation(self.path)
+        names = os.listdir(self.directory)
+        self.assertEqual(len(names), 1)
+        with open(os.path.join(self.directory, names[0]), 'wb') as f:
+            f.write(b'damaged')
+        self.assertTrue(Relation(self.path).equals(expected))
+        self.assertTrue(Relation(self.path).equals(expected))
+        self.assertEqual(os.listdir(self.directory), names)
+
+
+if __name__ == '__main__':
+    unittest.main()
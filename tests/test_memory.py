@@ -0,0 +1,48 @@
+"""Check that chains of operators share the columns of their input instead of copying them
+
+Run from the root of the repository with ``python -m unittest discover tests``.
+"""
+import os
+import sys
+import tracemalloc
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+from reframe import Relation
+from _reframe import _copy_on_write
+
+
+def chain(rel, times):
+    for _ in range(times):
+        rel = rel.query('a >= 0').project(['a', 'b', 'c']).rename('c', 'd').rename('d', 'c').sort('a')
+    return rel
+
+
+@unittest.skipUnless(_copy_on_write(), 'project and rename copy without pandas copy on write')
+class SharedColumns(unittest.TestCase):
+
+    def test_chain_shares_columns(self):
+        n = 1000000
+        frame = pd.DataFrame({'a': np.arange(n), 'b': np.arange(n) % 7, 'c': np.linspace(0, 1, n)})
+        size = frame.memory_usage().sum()
+        for key in ('a', None):
+            with self.subTest(key=key):
+                rel = chain(Relation(frame, key=key), 1)
+                tracemalloc.start()
+                try:
+                    res = chain(rel, 4)
+                    held, peak = tracemalloc.get_traced_memory()
+                finally:
+                    tracemalloc.stop()
+                for c in 'abc':
+                    self.assertTrue(np.shares_memory(res[c].to_numpy(), frame[c].to_numpy()))
+                self.assertLess(held, size / 100)
+                self.assertLess(peak, 1.2 * size)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+"""Check that Relation.open reads files the way Relation(filepath) does
+
+Run from the root of the repository with ``python -m unittest discover tests``.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from reframe import Relation
+
+
+class OpenFile(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, data):
+        path = os.path.join(self.directory, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_selected_rows_have_whole_file_dtypes(self):
+        path = os.path.join(self.directory, 'country.csv')
+        shutil.copy(os.path.join(ROOT, 'country.csv'), path)
+        whole = Relation(path).dtypes
+        # the second open loads the dtypes saved by the first
+        for _ in range(2):
+            selected = Relation.open(path).query('code == "NLD"').collect()
+            self.assertEqual(len(selected), 1)
+            self.assertEqual(selected.dtypes.to_dict(), whole.to_dict())
+
+    def test_quotes_are_refused(self):
+        path = self.write('quoted.csv', b'x|y\n1|"y"\n')
+        with self.assertRaisesRegex(ValueError, 'quoted fields'):
+            Relation.open(path)
+
+    def test_crlf_blank_lines_are_skipped(self):
+        path = self.write('crlf.csv', b'a,b\r\n1,x\r\n\r\n2,y\r\n')
+        opened = Relation.open(path, sep=',').collect()
+        expected = Relation(path, sep=',')
+        self.assertEqual(opened.values.tolist(), expected.values.tolist())
+        self.assertEqual(opened.dtypes.to_dict(), expected.dtypes.to_dict())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+"""Check that the workers give the same results as one worker, see set_parallel
+
+Run from the root of the repository with ``python -m unittest discover tests``.
+"""
+import os
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+import _reframe
+from reframe import Relation, set_parallel
+
+
+class SameResults(unittest.TestCase):
+
+    def setUp(self):
+        minimum = _reframe.PARALLEL_MIN_ROWS
+        _reframe.PARALLEL_MIN_ROWS = 1000
+        self.addCleanup(setattr, _reframe, 'PARALLEL_MIN_ROWS', minimum)
+        self.addCleanup(set_parallel, 1)
+        rng = np.random.default_rng(1)
+        n = 200000
+        # floats of very different sizes round differently when they are added up in another order
+        self.relation = Relation(pd.DataFrame({'g': rng.integers(0, 5, n),
+                                               'x': rng.standard_normal(n) * 10.0 ** rng.integers(-5, 8, n),
+                                               'i': rng.integers(0, 1000, n)}))
+
+    def test_few_groups(self):
+        for aggs in [dict(sum='x'), dict(mean='x'), dict(sum=['x', 'i'], mean=['x', 'i'], max='x', count='i')]:
+            with self.subTest(aggs=aggs):
+                set_parallel(1)
+                one = self.relation.groupby(['g']).agg(**aggs)
+                set_parallel(4)
+                self.assertTrue(self.relation.groupby(['g']).agg(**aggs).equals(one))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+"""Check that plans run by SQLite give the same rows as the pandas engine, see Relation.sqlite
+
+Run from the root of the repository with ``python -m unittest discover tests``.
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pandas as pd
+from reframe import Relation
+from _reframe import _sql
+
+
+def rows(relation):
+    """return the rows of a relation in a sorted list, with floats rounded as SQLite may add them up
+    differently"""
+    frame = pd.DataFrame(relation)
+    values = frame.round(6).astype(object).where(frame.notna(), None)
+    return sorted(map(repr, values.itertuples(index=False)))
+
+
+class SameRows(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.database = os.path.join(tempfile.mkdtemp(), 'world.db')
+        cls.country = Relation(os.path.join(ROOT, 'country.csv'))
+        cls.country.to_sqlite(cls.database, 'country', indexes=['continent'])
+        cls.world = Relation.sqlite(cls.database, 'country')
+        cls.pairs = Relation(pd.DataFrame({'a': [1, 1, 2, 3], 'b': ['x', 'x', 'y', 'z']}))
+        cls.pairs.to_sqlite(cls.database, 'pairs')
+        cls.stored = Relation.sqlite(cls.database, 'pairs')
+        cls.mixed = Relation(pd.DataFrame({'a': [1, 0, 2, 3], 'b': [0, 0, 1, None], 's': ['x', 'y', '1', 'z']}))
+        cls.mixed.to_sqlite(cls.database, 'mixed')
+        cls.stored_mixed = Relation.sqlite(cls.database, 'mixed')
+
+    def assertSame(self, lazy, eager, sql=True):
+        """check the rows of lazy against eager, and that SQLite runs lazy when sql is True"""
+        self.assertEqual(rows(lazy.collect()), rows(eager))
+        self.assertEqual(_sql(lazy.plan) is not None, sql)
+
+    def test_project(self):
+        self.assertSame(self.world.project(['continent', 'region']), self.country.project(['continent', 'region']))
+
+    def test_query(self):
+        q = 'continent in ["Asia", "Europe"] and not (lifeexpectancy < 70 or population > 100000000)'
+        self.assertSame(self.world.query(q), self.country.query(q))
+        q = 'indepyear != 1991 and region != "Caribbean"'
+        self.assertSame(self.world.query(q), self.country.query(q))
+
+    def test_rename(self):
+        self.assertSame(self.world.rename('name', 'country').project(['country']),
+                        self.country.rename('name', 'country').project(['country']))
+
+    def test_njoin(self):
+        regions = 'continent != "Asia"'
+        self.assertSame(self.world.project(['name', 'continent']).njoin(self.world.project(['continent', 'region']).query(regions)),
+                        self.country.project(['name', 'continent']).njoin(self.country.project(['continent', 'region']).query(regions)))
+
+    def test_set_operators(self):
+        big, old = 'population > 50000000', 'indepyear < 1800'
+        for op in ('union', 'intersect', 'minus'):
+            self.assertSame(getattr(self.world.query(big), op)(self.world.query(old)),
+                            getattr(self.country.query(big), op)(self.country.query(old)))
+
+    def test_groupby(self):
+        aggs = dict(count='name', sum='population', mean='lifeexpectancy', min='gnp', max='indepyear')
+        self.assertSame(self.world.groupby(['continent']).agg(**aggs), self.country.groupby(['continent']).agg(**aggs))
+        self.assertSame(self.world.groupby('region').median('gnp'), self.country.groupby('region').median('gnp'), sql=False)
+
+    def test_duplicate_rows(self):
+        self.assertSame(self.stored.rename('b', 'c'), self.pairs.rename('b', 'c'))
+        self.assertSame(self.stored.njoin(self.stored.rename('b', 'c')), self.pairs.njoin(self.pairs.rename('b', 'c')))
+
+    def test_division_runs_in_pandas(self):
+        # SQLite divides by zero to NULL, pandas to inf
+        for q in ('a / b > 1', 'not (a / b > 1)'):
+            self.assertSame(self.stored_mixed.query(q), self.mixed.query(q), sql=False)
+        q = 'continent in ["Asia", "Europe"] and not (lifeexpectancy < 70 or gnp / population > 0.01)'
+        self.assertSame(self.world.query(q), self.country.query(q), sql=False)
+
+    def test_numbers_and_text_run_in_pandas(self):
+        # SQLite converts between numbers and text when it compares them, pandas finds them unequal
+        for q in ('a == "1"', 's == 1', 's in ["1", 2]', 'not (s == 1)'):
+            self.assertSame(self.stored_mixed.query(q), self.mixed.query(q), sql=False)
+        for q in ('s == "1"', 'a + b > 1', 'not (b > 0)'):
+            self.assertSame(self.stored_mixed.query(q), self.mixed.query(q))
+
+
+if __name__ == '__main__':
+    unittest.main()